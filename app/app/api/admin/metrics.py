@@ -0,0 +1,25 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter
+
+from app.core.metrics import pool_status
+from app.db.instrumentation import query_metrics
+
+router = APIRouter()
+
+
+@router.get("/queries")
+async def read_query_metrics() -> dict[str, dict[str, Any]]:
+    """
+    SQL statement count, DB time and the slowest statement aggregated per route (`METHOD /route/{template}`) since
+    the start of this API process.
+    """
+    return query_metrics.snapshot()
+
+
+@router.get("/pools")
+async def read_pool_metrics() -> dict[str, Optional[dict[str, int]]]:
+    """
+    Current utilization of DB connection pools of this API process.
+    """
+    return {name: pool_status(name) for name in ("default", "admin")}
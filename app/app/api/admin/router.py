@@ -1,3 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-router = APIRouter()
+from app.core.users import current_admin_user
+from app.api.admin.metrics import router as metrics_router
+
+router = APIRouter(dependencies=[Depends(current_admin_user)])
+router.include_router(metrics_router, prefix="/metrics")
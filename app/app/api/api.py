@@ -6,6 +6,7 @@ from app.api.admin.router import router as admin_router
 from app.api.auth.router import router as auth_router
 from app.api.users import router as users_router
 from app.api.test import router as test_router
+from app.api.metrics import router as metrics_router
 
 api_router = APIRouter()
 api_router.include_router(rider_router, prefix="/rider", tags=["rider"])
@@ -14,3 +15,4 @@ api_router.include_router(admin_router, prefix="/admin", tags=["admin"])
 api_router.include_router(auth_router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users_router, prefix="/users", tags=["users"])
 api_router.include_router(test_router, tags=["test"])
+api_router.include_router(metrics_router, tags=["metrics"])
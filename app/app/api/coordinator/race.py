@@ -2,11 +2,12 @@ import shutil
 import uuid
 
 import imghdr
-import gpxo
 import pytz
-import numpy as np
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Optional
+from xml.etree.ElementTree import ParseError
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from starlette.datastructures import FormData
 
 from sqlmodel import Session, select
@@ -15,8 +16,13 @@ from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
 
 from app.core.celery import celery_app
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db, ThreadedAsyncSession
+from app.db.race_stats import race_participation_stats, is_race_approved
+from app.db.loaders import race_detail
+from app.api.pagination import paginate_by_id, paginate_by_timestamp_and_id, set_next_cursor
 from app.util.log import get_logger
+from app.util.gpx.offload import run_gpx_job
+from app.util.gpx.trackpoints import has_gpx_header, is_loop
 from app.tasks.set_race_in_progress import set_race_in_progress
 
 from app.tasks.generate_race_places import end_race_and_generate_places
@@ -41,55 +47,61 @@ logger = get_logger()
 
 @router.get("/")
 async def read_races(
-        db: Session = Depends(get_db), limit: int = 30, offset: int = 0
+        response: Response,
+        db: ThreadedAsyncSession = Depends(get_async_db), limit: int = 30, offset: int = 0,
+        cursor: Optional[str] = None
 ) -> list[RaceReadListCoordinator]:
     """
-    List all races.
+    List all races, newest first. Supports keyset pagination with `cursor` (see `X-Next-Cursor` response header).
     """
-    stmt = (
-        select(Race)
-        .offset(offset)
-        .limit(limit)
-        .order_by(Race.start_timestamp.desc())  # type: ignore[arg-type, attr-defined]
-    )
-    races = db.exec(stmt).all()
+    stats = race_participation_stats()
+
+    def read(session: Session) -> list[RaceReadListCoordinator]:
+        stmt = paginate_by_timestamp_and_id(
+            select(Race, stats.c.participation_count, stats.c.assigned_count)
+            .outerjoin(stats, stats.c.race_id == Race.id),
+            Race.start_timestamp, Race.id, cursor=cursor, limit=limit, offset=offset
+        )
+        rows = session.exec(stmt).all()
+
+        return [RaceReadListCoordinator.from_orm(r, update={
+            "is_approved": is_race_approved(r.status, participation_count, assigned_count)})
+                for r, participation_count, assigned_count in rows]
+
+    races = await db.run_sync(read)
+    set_next_cursor(response, races, limit, lambda r: (r.start_timestamp, r.id))
 
-    return [RaceReadListCoordinator.from_orm(r, update={
-        "is_approved": any([p.place_assigned_overall is not None for p in
-                            r.race_participations]) or (r.status == RaceStatus.ended and not r.race_participations)})
-            for
-            r in races]  # type: ignore[return-value]
+    return races
 
 
 @router.get("/{id}")
 async def read_race(
-        id: int, db: Session = Depends(get_db),
+        id: int, db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> RaceReadDetailCoordinator:
     """
     Get details about a specific race.
     """
-    stmt = (
-        select(Race)
-        .where(Race.id == id)
-    )
-    race = db.exec(stmt).first()
+    def read(session: Session) -> RaceReadDetailCoordinator:
+        stmt = (
+            select(Race)
+            .where(Race.id == id)
+            .options(*race_detail())
+        )
+        race = session.exec(stmt).first()
 
-    if not race:
-        raise HTTPException(404)
+        if not race:
+            raise HTTPException(404)
+
+        is_approved = any([p.place_assigned_overall is not None for p in race.race_participations]) or (
+                race.status == RaceStatus.ended and not race.race_participations)
 
-    is_approved = any([p.place_assigned_overall is not None for p in race.race_participations]) or (
-            race.status == RaceStatus.ended and not race.race_participations)
+        return RaceReadDetailCoordinator.from_orm(race, update={
+            "is_approved": is_approved,
+            "race_participations": [
+                RaceParticipationListReadNames.from_participation(p) for p in race.race_participations]
+        })
 
-    return RaceReadDetailCoordinator.from_orm(race, update={
-        "is_approved": is_approved,
-        "race_participations": [RaceParticipationListReadNames.from_orm(p, update={
-            "rider_name": p.rider.account.name,
-            "rider_surname": p.rider.account.surname,
-            "rider_username": p.rider.account.username,
-            "time_seconds": p.ride_end_timestamp - p.ride_start_timestamp if (
-                    p.ride_start_timestamp and p.ride_end_timestamp) else None
-        }) for p in race.race_participations]
-    })
+    return await db.run_sync(read)
 
 
 @router.post("/create")
@@ -141,24 +153,29 @@ async def create_upload_route(request: Request) -> dict[str, str]:
     form: FormData = await request.form()
     tmp_path = str(form.get('fileobj.path'))
 
-    with open(tmp_path, 'r') as f:
-        content = f.read(43)
-        if content.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<gpx'):
-            print('GPX')
-        else:
-            print('INVALID TYPE')
+    def store_route() -> tuple[str, str]:
+        if not has_gpx_header(tmp_path):
             raise HTTPException(400)
 
-    track = gpxo.Track(tmp_path)
-    start_point = track.data.head(1)[['latitude (°)', 'longitude (°)']].values.T.squeeze()
-    end_point = track.data.tail(1)[['latitude (°)', 'longitude (°)']].values.T.squeeze()
+        try:
+            loop = is_loop(tmp_path, LOOP_DISTANCE_THRESHOLD)
+        except (ValueError, ParseError):
+            # no trackpoints or malformed XML
+            raise HTTPException(400)
 
-    # assert track is a loop
-    assert np.linalg.norm(start_point - end_point) <= LOOP_DISTANCE_THRESHOLD
+        if not loop:
+            raise HTTPException(400)
 
-    new_name = f"{str(uuid.uuid4())}.gpx"
-    new_path = f'/attachments/{new_name}'
-    shutil.move(tmp_path, new_path)
+        new_name = f"{str(uuid.uuid4())}.gpx"
+        new_path = f'/attachments/{new_name}'
+
+        # numpy is only loaded once a route is uploaded, not at API startup
+        from app.util.gpx.route_artifact import publish_route
+
+        publish_route(tmp_path, new_path)
+        return new_name, new_path
+
+    new_name, new_path = await run_gpx_job("upload_route", store_route)
 
     return {  # type: ignore[return-value]
         k: form.get(k) for k in (  # type: ignore[misc]
@@ -266,24 +283,27 @@ async def cancel_race(
 @router.get("/{id}/participations")
 async def race_list_participants(
         id: int,
+        response: Response,
         limit: int = 30, offset: int = 0,
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = None,
+        db: ThreadedAsyncSession = Depends(get_async_db)
 ) -> list[RaceParticipationCoordinatorListRead]:
     """
-    List all participations (no matter what state) in given race.
+    List all participations (no matter what state) in given race. Supports keyset pagination with `cursor` (see
+    `X-Next-Cursor` response header).
     """
-    race = db.get(Race, id)
+    race = await db.get(Race, id)
 
     if not race:
         raise HTTPException(404)
 
-    stmt = (
+    stmt = paginate_by_id(
         select(RaceParticipation)
-        .where(RaceParticipation.race_id == id)
-        .offset(offset)
-        .limit(limit)  # type: ignore[arg-type, attr-defined]
+        .where(RaceParticipation.race_id == id),
+        RaceParticipation.id, cursor=cursor, limit=limit, offset=offset
     )
-    participations = db.exec(stmt).all()
+    participations = await db.all(stmt)
+    set_next_cursor(response, participations, limit, lambda p: (p.id,))
 
     return participations  # type: ignore[return-value]
 
@@ -349,6 +369,7 @@ async def race_assign_places(
             RaceParticipation.race_id == id,
             RaceParticipation.status == RaceParticipationStatus.approved
         )
+        .order_by(RaceParticipation.id)  # type: ignore[arg-type]
     )
     participations = db.exec(stmt).all()
 
@@ -372,9 +393,8 @@ async def race_assign_places(
         db.add(p)
 
     db.commit()
-    db.refresh(race)
 
     assign_places_in_classifications.delay(race_id=id)
 
-    return [RaceParticipationCoordinatorListRead.from_orm(p) for p in race.race_participations if
-            p.status == RaceParticipationStatus.approved]
+    # reload all committed participations at once, instead of refreshing them one by one
+    return [RaceParticipationCoordinatorListRead.from_orm(p) for p in db.exec(stmt).all()]
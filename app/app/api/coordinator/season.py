@@ -1,10 +1,15 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session, select
 
-from app.db.session import get_db
-from app.models.classification import Classification
+from app.db.session import get_db, get_async_db, ThreadedAsyncSession
+from app.api.pagination import paginate_by_timestamp_and_id, set_next_cursor
+from app.models.account import Gender
+from app.models.bike import BikeType
+from app.models.classification import Classification, ClassificationPredicate
 from app.models.season import Season, SeasonRead, SeasonStart
 
 router = APIRouter()
@@ -14,30 +19,31 @@ router = APIRouter()
 
 @router.get("/")
 async def read_seasons(
-        db: Session = Depends(get_db), limit: int = 30, offset: int = 0
+        response: Response,
+        db: ThreadedAsyncSession = Depends(get_async_db), limit: int = 30, offset: int = 0,
+        cursor: Optional[str] = None
 ) -> list[SeasonRead]:
     """
-    List all seasons.
+    List all seasons, newest first. Supports keyset pagination with `cursor` (see `X-Next-Cursor` response header).
     """
-    stmt = (
-        select(Season)
-        .offset(offset)
-        .limit(limit)
-        .order_by(Season.start_timestamp.desc())  # type: ignore[arg-type, attr-defined]
+    stmt = paginate_by_timestamp_and_id(
+        select(Season),
+        Season.start_timestamp, Season.id, cursor=cursor, limit=limit, offset=offset
     )
-    seasons = db.exec(stmt).all()
+    seasons = await db.all(stmt)
+    set_next_cursor(response, seasons, limit, lambda s: (s.start_timestamp, s.id))
 
     return seasons  # type: ignore[return-value]
 
 
 @router.get("/{id}")
 async def read_season(
-        id: int, db: Session = Depends(get_db)
+        id: int, db: ThreadedAsyncSession = Depends(get_async_db)
 ) -> SeasonRead:
     """
     Get details about a specific season.
     """
-    season = db.get(Season, id)
+    season = await db.get(Season, id)
 
     if not season:
         raise HTTPException(404)
@@ -84,25 +90,30 @@ def create_new_classifications(season: Season) -> list[Classification]:
         Classification(
             name="Klasyfikacja generalna",
             description="Bez ograniczeń.",
+            predicate_json=ClassificationPredicate().to_json(),
             season=season,
         ),
         Classification(
             name="Szosa",
             description="Rowery szosowe z przerzutkami.",
+            predicate_json=ClassificationPredicate(bike_type=BikeType.road).to_json(),
             season=season,
         ),
         Classification(
             name="Ostre koło",
             description="Rowery typu fixie i singlespeed. Brak przerzutek.",
+            predicate_json=ClassificationPredicate(bike_type=BikeType.fixie).to_json(),
             season=season,
         ),
         Classification(
             name="Mężczyźni",
             description="Klasyfikacja mężczyzn.",
+            predicate_json=ClassificationPredicate(gender=Gender.male).to_json(),
             season=season,
         ),
         Classification(
             name="Kobiety",
             description="Klasyfikacja kobiet.",
+            predicate_json=ClassificationPredicate(gender=Gender.female).to_json(),
             season=season,
         )]
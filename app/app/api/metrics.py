@@ -0,0 +1,15 @@
+import anyio
+from fastapi import APIRouter, Response
+
+from app.util.metrics import registry, CONTENT_TYPE
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics() -> Response:
+    """
+    API and Celery task metrics in Prometheus text exposition format.
+    """
+    # Celery task metrics are read from Redis
+    return Response(await anyio.to_thread.run_sync(registry.render), media_type=CONTENT_TYPE)
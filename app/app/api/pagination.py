@@ -0,0 +1,87 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+from sqlmodel.sql.expression import Select, SelectOfScalar
+
+# Keyset pagination: list endpoints accept an opaque `cursor` pointing right after the last row of the previous page,
+# and return the cursor for the next one in this header (only if the page is full). When `cursor` is given, `offset`
+# is ignored.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_S = TypeVar("_S", Select, SelectOfScalar)
+_T = TypeVar("_T")
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, length: int) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise HTTPException(400, "Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor: str) -> int:
+    (id,) = _decode_cursor(cursor, 1)
+    if not isinstance(id, int):
+        raise HTTPException(400, "Invalid cursor")
+    return id
+
+
+def decode_timestamp_id_cursor(cursor: str) -> tuple[datetime, int]:
+    timestamp, id = _decode_cursor(cursor, 2)
+    try:
+        parsed_timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(id, int):
+        raise HTTPException(400, "Invalid cursor")
+    return parsed_timestamp, id
+
+
+def paginate_by_id(stmt: _S, id_column: Any, cursor: Optional[str], limit: int, offset: int) -> _S:
+    """
+    Order by `id_column` ascending and select a page either after `cursor` or at `offset`.
+    """
+    stmt = stmt.order_by(id_column).limit(limit)
+    if cursor is None:
+        return stmt.offset(offset)
+    return stmt.where(id_column > decode_id_cursor(cursor))
+
+
+def paginate_by_timestamp_and_id(
+        stmt: _S,
+        timestamp_column: Any,
+        id_column: Any,
+        cursor: Optional[str],
+        limit: int,
+        offset: int
+) -> _S:
+    """
+    Order by `(timestamp_column, id_column)` descending (newest first) and select a page either after `cursor` or at
+    `offset`.
+    """
+    stmt = stmt.order_by(timestamp_column.desc(), id_column.desc()).limit(limit)
+    if cursor is None:
+        return stmt.offset(offset)
+    timestamp, id = decode_timestamp_id_cursor(cursor)
+    return stmt.where(or_(timestamp_column < timestamp, and_(timestamp_column == timestamp, id_column < id)))
+
+
+def set_next_cursor(response: Response, page: Sequence[_T], limit: int, key: Callable[[_T], tuple[Any, ...]]) -> None:
+    """
+    Expose the cursor of the next page if the current one is full. `key` returns pagination key values of a row.
+    """
+    if page and len(page) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(page[-1]))
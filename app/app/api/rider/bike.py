@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session, select
 from sqlalchemy.exc import IntegrityError
 from pydantic import ValidationError
 
 from app.core.users import current_rider_user
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db, ThreadedAsyncSession
+from app.api.pagination import paginate_by_id, set_next_cursor
 
 from app.models.bike import Bike, BikeCreate, BikeUpdate
 from app.models.rider import Rider
@@ -16,21 +19,23 @@ router = APIRouter()
 
 @router.get("/")
 async def read_bikes(
+        response: Response,
         limit: int = 30, offset: int = 0,
+        cursor: Optional[str] = None,
         rider: Rider = Depends(current_rider_user),
-        db: Session = Depends(get_db)
+        db: ThreadedAsyncSession = Depends(get_async_db)
 ) -> list[Bike]:
     """
-    List all bikes owned by a given rider.
+    List all bikes owned by a given rider. Supports keyset pagination with `cursor` (see `X-Next-Cursor` response
+    header).
     """
-    stmt = (
+    stmt = paginate_by_id(
         select(Bike)
-        .where(Bike.rider_id == rider.id)
-        .offset(offset)
-        .limit(limit)
-        .order_by(Bike.id)  # type: ignore[arg-type]
+        .where(Bike.rider_id == rider.id),
+        Bike.id, cursor=cursor, limit=limit, offset=offset
     )
-    bikes = db.exec(stmt).all()
+    bikes = await db.all(stmt)
+    set_next_cursor(response, bikes, limit, lambda b: (b.id,))
 
     return bikes  # type: ignore[return-value]
 
@@ -39,7 +44,7 @@ async def read_bikes(
 async def read_bike(
         id: int,
         rider: Rider = Depends(current_rider_user),
-        db: Session = Depends(get_db),
+        db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> Bike:
     """
     Get details about a specific bike. Not restricted to bikes owned by current rider.
@@ -48,7 +53,7 @@ async def read_bike(
         select(Bike)
         .where(Bike.id == id)
     )
-    bike = db.exec(stmt).first()
+    bike = await db.first(stmt)
 
     if not bike:
         raise HTTPException(404)
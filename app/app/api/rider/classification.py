@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from sqlmodel.sql.expression import SelectOfScalar
 
-from app.db.session import get_db
+from app.db.session import get_async_db, ThreadedAsyncSession
 
 from app.models.rider import RiderRead
 from app.models.classification import Classification
@@ -13,22 +13,25 @@ router = APIRouter()
 @router.get("/{id}/rider")
 async def read_riders(
         id: int,
-        db: Session = Depends(get_db),
+        db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> list[RiderRead]:
     """
     List all riders for a given classification.
     """
-    stmt: SelectOfScalar = (
-        select(Classification)
-        .where(Classification.id == id)
-    )
+    def read(session: Session) -> list[RiderRead]:
+        stmt: SelectOfScalar = (
+            select(Classification)
+            .where(Classification.id == id)
+        )
 
-    classification = db.exec(stmt).first()
+        classification = session.exec(stmt).first()
 
-    if not classification:
-        raise HTTPException(404)
+        if not classification:
+            raise HTTPException(404)
 
-    if not classification.riders or len(classification.riders) == 0:
-        raise HTTPException(404)
+        if not classification.riders or len(classification.riders) == 0:
+            raise HTTPException(404)
 
-    return [RiderRead.from_orm(r) for r in classification.riders]
+        return [RiderRead.from_orm(r) for r in classification.riders]
+
+    return await db.run_sync(read)
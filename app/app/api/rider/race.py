@@ -1,15 +1,24 @@
 import uuid
 import shutil
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from starlette.datastructures import FormData
 
+from sqlalchemy import update
 from sqlmodel import Session, select
 from sqlmodel.sql.expression import SelectOfScalar
 
-from app.tasks.process_race_result_submission import process_race_result_submission
+from app.tasks.process_race_result_submission import process_race_result_submissions_batch, \
+    SUBMISSION_BATCH_DELAY_SECONDS
 from app.core.users import current_rider_user
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db, ThreadedAsyncSession
+from app.db.race_stats import race_participation_stats, is_race_approved
+from app.db.loaders import participation_rider_names
+from app.api.pagination import paginate_by_timestamp_and_id, set_next_cursor
+from app.util.gpx.offload import run_gpx_job
+from app.util.gpx.trackpoints import has_gpx_header
 from app.models.race import Race, RaceReadListRider, RaceReadDetailRider, RaceStatus
 from app.models.bike import Bike
 from app.models.rider import Rider
@@ -24,77 +33,85 @@ router = APIRouter()
 
 @router.get("/")
 async def read_races(
+        response: Response,
         rider: Rider = Depends(current_rider_user),
-        db: Session = Depends(get_db), limit: int = 30, offset: int = 0
+        db: ThreadedAsyncSession = Depends(get_async_db), limit: int = 30, offset: int = 0,
+        cursor: Optional[str] = None
 ) -> list[RaceReadListRider]:
     """
-    List all races.
+    List all races, newest first. Supports keyset pagination with `cursor` (see `X-Next-Cursor` response header).
     """
-    stmt = (
-        select(Race)
-        .offset(offset)
-        .limit(limit)
-        .order_by(Race.start_timestamp.desc())  # type: ignore[arg-type, attr-defined]
-    )
-    races = db.exec(stmt).all()
+    stats = race_participation_stats(rider_id=rider.id)
 
-    return [RaceReadListRider.from_orm(r, update={
-        'participation_status': getattr(
-            next((p for p in r.race_participations if p.rider_id == rider.id), None),
-            'status', None),
-        'is_approved': any([p.place_assigned_overall is not None for p in
-                            r.race_participations]) or (r.status == RaceStatus.ended and not r.race_participations)
-    }) for r in races]
+    def read(session: Session) -> list[RaceReadListRider]:
+        stmt = paginate_by_timestamp_and_id(
+            select(Race, stats.c.participation_count, stats.c.assigned_count, stats.c.participation_status)
+            .outerjoin(stats, stats.c.race_id == Race.id),
+            Race.start_timestamp, Race.id, cursor=cursor, limit=limit, offset=offset
+        )
+        rows = session.exec(stmt).all()
+
+        return [RaceReadListRider.from_orm(r, update={
+            'participation_status': participation_status,
+            'is_approved': is_race_approved(r.status, participation_count, assigned_count)
+        }) for r, participation_count, assigned_count, participation_status in rows]
+
+    races = await db.run_sync(read)
+    set_next_cursor(response, races, limit, lambda r: (r.start_timestamp, r.id))
+
+    return races
 
 
 @router.get("/{id}")
 async def read_race(
         id: int,
         rider: Rider = Depends(current_rider_user),
-        db: Session = Depends(get_db),
+        db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> RaceReadDetailRider:
     """
     Get details about a specific race.
     """
-    stmt = (
-        select(Race)
-        .where(Race.id == id)
-    )
-    race = db.exec(stmt).first()
+    def read(session: Session) -> RaceReadDetailRider:
+        stmt = (
+            select(Race)
+            .where(Race.id == id)
+        )
+        race = session.exec(stmt).first()
 
-    if not race:
-        raise HTTPException(404)
+        if not race:
+            raise HTTPException(404)
+
+        return RaceReadDetailRider.from_orm(race, update={
+            'participation_status': getattr(
+                next((p for p in race.race_participations if p.rider_id == rider.id), None),
+                'status', None),
+            'is_approved': any([p.place_assigned_overall is not None for p in race.race_participations]) or (
+                        race.status == RaceStatus.ended and not race.race_participations)
+        })
 
-    return RaceReadDetailRider.from_orm(race, update={
-        'participation_status': getattr(
-            next((p for p in race.race_participations if p.rider_id == rider.id), None),
-            'status', None),
-        'is_approved': any([p.place_assigned_overall is not None for p in race.race_participations]) or (
-                    race.status == RaceStatus.ended and not race.race_participations)
-    })
+    return await db.run_sync(read)
 
 
 @router.get('/{race_id}/participation/all')
 async def get_all_participations(
         race_id: int,
-        db: Session = Depends(get_db),
+        db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> list[RaceParticipationListReadNames]:
-    stmt: SelectOfScalar = (
-        select(RaceParticipation)
-        .where(RaceParticipation.race_id == race_id)
-        .order_by(RaceParticipation.place_assigned_overall)  # type: ignore[arg-type]
-    )
-    participations = db.exec(stmt).all()
+    def read(session: Session) -> list[RaceParticipationListReadNames]:
+        stmt: SelectOfScalar = (
+            select(RaceParticipation)
+            .where(RaceParticipation.race_id == race_id)
+            .order_by(RaceParticipation.place_assigned_overall)  # type: ignore[arg-type]
+            .options(*participation_rider_names())
+        )
+        participations = session.exec(stmt).all()
 
-    if not participations or len(participations) <= 0:
-        raise HTTPException(404)
+        if not participations or len(participations) <= 0:
+            raise HTTPException(404)
 
-    return [RaceParticipationListReadNames.from_orm(p, update={
-        'rider_name': p.rider.account.name,
-        'rider_surname': p.rider.account.surname,
-        'rider_username': p.rider.account.username,
-        'time_seconds': p.ride_end_timestamp - p.ride_start_timestamp
-    }) for p in participations]
+        return [RaceParticipationListReadNames.from_participation(p) for p in participations]
+
+    return await db.run_sync(read)
 
 
 @router.post("/{id}/join")
@@ -181,7 +198,7 @@ async def upload_race_result(
         id: int,
         request: Request,
         rider: Rider = Depends(current_rider_user),
-        db: Session = Depends(get_db),
+        db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> None:
     """
     Submit race result along with recording GPX.
@@ -189,50 +206,68 @@ async def upload_race_result(
     form: FormData = await request.form()
     tmp_path = str(form.get('fileobj.path'))
 
-    with open(tmp_path, 'r') as f:
-        content = f.read(43)
-        if content.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<gpx'):
-            print('GPX')
-        else:
-            print('INVALID TYPE')
-            raise HTTPException(400)
+    if not await run_gpx_job("upload_result_header", has_gpx_header, tmp_path):
+        raise HTTPException(400)
 
-    stmt_race: SelectOfScalar = (
-        select(Race)
-        .where(Race.id == id)
-    )
-    race = db.exec(stmt_race).first()
+    def check_participation(session: Session) -> int:
+        stmt_race: SelectOfScalar = (
+            select(Race)
+            .where(Race.id == id)
+        )
+        race = session.exec(stmt_race).first()
 
-    if not race:
-        raise HTTPException(404)
+        if not race:
+            raise HTTPException(404)
 
-    if race.status != RaceStatus.in_progress:
-        raise HTTPException(400, f"Race has status {race.status}, in_progress is required.")
+        if race.status != RaceStatus.in_progress:
+            raise HTTPException(400, f"Race has status {race.status}, in_progress is required.")
 
-    stmt_participation: SelectOfScalar = (
-        select(RaceParticipation)
-        .where(
-            RaceParticipation.race_id == race.id,
-            RaceParticipation.rider_id == rider.id
+        stmt_participation: SelectOfScalar = (
+            select(RaceParticipation)
+            .where(
+                RaceParticipation.race_id == race.id,
+                RaceParticipation.rider_id == rider.id
+            )
         )
-    )
-    race_participation = db.exec(stmt_participation).first()
+        race_participation = session.exec(stmt_participation).first()
 
-    if race_participation is None:
-        raise HTTPException(400, "Not participating in race.")
+        if race_participation is None:
+            raise HTTPException(400, "Not participating in race.")
 
-    if race_participation.status != RaceParticipationStatus.approved:
-        raise HTTPException(400, f"Race participation has status {race_participation.status}, approved is required.")
+        if race_participation.status != RaceParticipationStatus.approved:
+            raise HTTPException(400,
+                                f"Race participation has status {race_participation.status}, approved is required.")
 
-    if race_participation.ride_gpx_file:
-        raise HTTPException(400, "Ride GPX was already submitted")
+        if race_participation.ride_gpx_file:
+            raise HTTPException(400, "Ride GPX was already submitted")
+
+        return race_participation.id  # type: ignore[return-value]
+
+    participation_id = await db.run_sync(check_participation)
 
     new_name = f"{str(uuid.uuid4())}.gpx"
     new_path = f'/attachments/{new_name}'
-    shutil.move(tmp_path, new_path)
+    await run_gpx_job("upload_result_move", shutil.move, tmp_path, new_path)
+
+    def submit(session: Session) -> None:
+        # conditional, so of concurrent uploads of the same rider only one is accepted
+        result = session.execute(
+            update(RaceParticipation)
+            .where(
+                RaceParticipation.id == participation_id,  # type: ignore[arg-type]
+                RaceParticipation.ride_gpx_file == None  # type: ignore[arg-type] # noqa: E711
+            )
+            .values(ride_gpx_file=new_path)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:  # type: ignore[attr-defined]
+            raise HTTPException(400, "Ride GPX was already submitted")
+        session.commit()
+
+    await db.run_sync(submit)
 
-    process_race_result_submission.delay(
-        race_id=race.id,
-        rider_id=rider.id,
-        recording_filepath=new_path
+    # processed with all results submitted until the run starts
+    process_race_result_submissions_batch.apply_async(
+        kwargs={"race_id": id},
+        countdown=SUBMISSION_BATCH_DELAY_SECONDS
     )
@@ -1,14 +1,20 @@
+from typing import Any, Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from sqlmodel.sql.expression import SelectOfScalar
 
-from app.db.session import get_db
+from app.core.users import current_rider_user
+from app.db.session import get_async_db, ThreadedAsyncSession
+from app.db.leaderboard import classification_standings
+from app.util.leaderboard_cache import get_standings, get_standings_around, read_standings
+from app.models.rider import Rider
 
 from app.models.rider_classification_link import (
     RiderClassificationLink,
     RiderClassificationLinkRead,
-    RiderClassificationLinkRiderDetails)
-from app.api.rider.classification import read_riders
+    RiderClassificationLinkRiderDetails,
+    RiderClassificationLinkLeaderboardEntry)
 
 router = APIRouter()
 
@@ -16,41 +22,72 @@ router = APIRouter()
 @router.get("/{classification_id}/classification")
 async def read_scores_from_classification(
         classification_id: int,
-        db: Session = Depends(get_db)
+        db: ThreadedAsyncSession = Depends(get_async_db)
 ) -> list[RiderClassificationLinkRiderDetails]:
     """
     Read all scores from given classification.
     """
-    stmt: SelectOfScalar = (
-        select(RiderClassificationLink)
-        .where(RiderClassificationLink.classification_id == classification_id)
-    )
-    links = db.exec(stmt).all()
+    def read(session: Session) -> list[dict[str, Any]]:
+        standings = get_standings(classification_id, session)
+        if standings is None:
+            standings = read_standings([classification_id], session)[classification_id]
+        return standings
 
-    if not links or len(links) <= 0:
+    standings = await db.run_sync(read)
+
+    if not standings:
         raise HTTPException(404)
 
-    links_parsed = [RiderClassificationLinkRead.from_orm(s) for s in links]
-    riders = await read_riders(classification_id, db)
-    scores = []
+    return [RiderClassificationLinkRiderDetails(**entry) for entry in standings]
+
 
-    for link in links_parsed:
-        for rider in riders:
-            if rider.id == link.rider_id:
-                scores.append(RiderClassificationLinkRiderDetails(
-                    score=link.score,
-                    name=rider.account.name,
-                    surname=rider.account.surname,
-                    username=rider.account.username)
-                )
+@router.get("/{classification_id}/leaderboard")
+async def read_classification_leaderboard(
+        classification_id: int,
+        limit: int = 30, offset: int = 0,
+        around: Optional[int] = None,
+        rider: Rider = Depends(current_rider_user),
+        db: ThreadedAsyncSession = Depends(get_async_db)
+) -> list[RiderClassificationLinkLeaderboardEntry]:
+    """
+    Read a page of classification leaderboard with ranks. If `around` is given, return the current rider's entry with
+    up to `around` entries above and below it instead.
+    """
+    def read(session: Session) -> list[dict[str, Any]]:
+        if around is None:
+            standings = get_standings(classification_id, session, offset=offset, limit=limit)
+        else:
+            standings = get_standings_around(classification_id, rider.id, around, session)  # type: ignore[arg-type]
+        if standings is not None:
+            return standings
+
+        leaderboard = classification_standings([classification_id])
+        stmt = select(*leaderboard.c).order_by(leaderboard.c.position)  # type: ignore[call-overload]
+
+        if around is None:
+            stmt = stmt.offset(offset).limit(limit)
+        else:
+            own_position = (
+                select(leaderboard.c.position)
+                .where(leaderboard.c.rider_id == rider.id)
+                .scalar_subquery()
+            )
+            stmt = stmt.where(leaderboard.c.position.between(own_position - around, own_position + around))
+
+        return [row._asdict() for row in session.exec(stmt).all()]
+
+    entries = await db.run_sync(read)
+
+    if not entries and (around is not None or offset == 0):
+        raise HTTPException(404)
 
-    return sorted(scores, key=lambda x: x.score, reverse=True)
+    return [RiderClassificationLinkLeaderboardEntry(**entry) for entry in entries]
 
 
 @router.get("/{rider_id}/rider")
 async def read_scores_from_rider(
         rider_id: int,
-        db: Session = Depends(get_db)
+        db: ThreadedAsyncSession = Depends(get_async_db)
 ) -> list[RiderClassificationLinkRead]:
     """
     Read all scores from given rider.
@@ -59,7 +96,7 @@ async def read_scores_from_rider(
         select(RiderClassificationLink)
         .where(RiderClassificationLink.rider_id == rider_id)
     )
-    scores = db.exec(stmt).all()
+    scores = await db.all(stmt)
 
     if not scores or len(scores) <= 0:
         raise HTTPException(404)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select
 from sqlmodel.sql.expression import SelectOfScalar
 
-from app.db.session import get_db
+from app.db.session import get_async_db, ThreadedAsyncSession
 
 from app.models.classification import Classification, ClassificationRead
 from app.models.season import Season, SeasonRead
@@ -13,7 +13,7 @@ router = APIRouter()
 @router.get("/{id}/classification")
 async def read_classifications(
         id: int,
-        db: Session = Depends(get_db),
+        db: ThreadedAsyncSession = Depends(get_async_db),
 ) -> list[ClassificationRead]:
     """
     List all classifications for a given season.
@@ -22,7 +22,7 @@ async def read_classifications(
         select(Classification)
         .where(Classification.season_id == id)
     )
-    classifications = db.exec(stmt).all()
+    classifications = await db.all(stmt)
 
     if not classifications or len(classifications) <= 0:
         raise HTTPException(404)
@@ -31,7 +31,7 @@ async def read_classifications(
 
 
 @router.get("/current")
-async def read_current_season(db: Session = Depends(get_db)) -> SeasonRead:
+async def read_current_season(db: ThreadedAsyncSession = Depends(get_async_db)) -> SeasonRead:
     """
     Get the current season.
     """
@@ -39,7 +39,7 @@ async def read_current_season(db: Session = Depends(get_db)) -> SeasonRead:
         select(Season)
         .order_by(Season.start_timestamp.desc())  # type: ignore[attr-defined]
     )
-    season = db.exec(stmt).first()
+    season = await db.first(stmt)
 
     if not season:
         raise HTTPException(404)
@@ -48,14 +48,14 @@ async def read_current_season(db: Session = Depends(get_db)) -> SeasonRead:
 
 
 @router.get("/all")
-async def read_all_seasons(db: Session = Depends(get_db)) -> list[SeasonRead]:
+async def read_all_seasons(db: ThreadedAsyncSession = Depends(get_async_db)) -> list[SeasonRead]:
     """
     Get all seasons.
     """
     stmt: SelectOfScalar = (
         select(Season)
     )
-    seasons = db.exec(stmt).all()
+    seasons = await db.all(stmt)
 
     if not seasons or len(seasons) <= 0:
         raise HTTPException(404)
@@ -0,0 +1,95 @@
+"""
+Throughput of concurrent read requests served with the synchronous session (`get_db`) and with the thread-offloaded
+one (`get_async_db`). Runs against a throwaway SQLite database with an artificial per-statement latency standing in
+for the Oracle round trip, so no live system is needed.
+
+Run from the `app` directory:
+
+    python -m app.benchmark.concurrent_reads --requests 200 --concurrency 50 --latency-ms 20
+"""
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Any, Generator
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, select
+
+from app.db.session import get_db, get_async_db, ThreadedAsyncSession
+from app.models.season import Season, SeasonRead
+
+
+def create_benchmark_app(latency: float, db_path: str, pool_size: int) -> FastAPI:
+    # with `get_db`, a request blocked on pool checkout blocks the event loop, so sessions of finished requests are
+    # never closed - the pool has to fit all concurrent requests or the sync variant deadlocks until pool timeout
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False},
+                           pool_size=pool_size, max_overflow=0)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(*args: Any) -> None:
+        time.sleep(latency)
+
+    Season.__table__.create(engine)  # type: ignore[attr-defined]
+    session_factory = sessionmaker(bind=engine, class_=Session)  # type: ignore[type-var]
+    with session_factory() as session:
+        session.add_all([Season(name=f"Season {i}", start_timestamp=datetime(2000 + i, 1, 1)) for i in range(10)])
+        session.commit()
+
+    def get_benchmark_db() -> Generator[Session, Any, None]:
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = get_benchmark_db
+
+    @app.get("/sync")
+    async def read_seasons_sync(db: Session = Depends(get_db)) -> list[SeasonRead]:
+        return db.exec(select(Season)).all()  # type: ignore[return-value]
+
+    @app.get("/async")
+    async def read_seasons_async(db: ThreadedAsyncSession = Depends(get_async_db)) -> list[SeasonRead]:
+        return await db.all(select(Season))  # type: ignore[return-value]
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        async def request() -> None:
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[request() for _ in range(requests)])
+        return requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_benchmark_app(latency=args.latency_ms / 1000, db_path=f"{tmp_dir}/benchmark.db",
+                                   pool_size=args.concurrency)
+
+        for name, path in (("get_db", "/sync"), ("get_async_db", "/async")):
+            throughput = await measure(app, path, requests=args.requests, concurrency=args.concurrency)
+            print(f"{name:>14}: {throughput:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
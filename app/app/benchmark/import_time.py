@@ -0,0 +1,53 @@
+"""
+Cold start of an API worker: time and peak RSS of importing a module in a fresh interpreter, and which heavy
+scientific packages it loads. Each run is a separate subprocess, so nothing is cached in `sys.modules`.
+
+Run from the `app` directory:
+
+    python -m app.benchmark.import_time --runs 5 --module app.main
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "gpxo", "matplotlib")
+
+_MEASURE = """
+import sys, json, time, resource
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(module: str) -> dict:
+    code = _MEASURE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    # the imported module may log to stdout, the measurement is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="app.main")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    seconds = [r["seconds"] for r in runs]
+    rss = [r["max_rss_kb"] / 1024 for r in runs]
+
+    print(f"{'import time':>14}: {statistics.median(seconds):8.3f} s (min {min(seconds):.3f}, max {max(seconds):.3f})")
+    print(f"{'peak RSS':>14}: {statistics.median(rss):8.1f} MiB")
+    print(f"{'heavy modules':>14}: {', '.join(runs[-1]['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,58 @@
+import time
+from typing import Any, Optional
+
 from celery import Celery  # type: ignore
+from celery.signals import task_prerun, task_postrun, task_failure, worker_process_init  # type: ignore
+from contextvars import Token
+
 import app.core.celeryconfig as celeryconfig
+from app.core.metrics import celery_task_runtime, celery_task_failures, pool_status
+from app.db.instrumentation import start_tracking, stop_tracking
+from app.core.config import native_pools
+from app.db.session import engine, engine_admin
+from app.util.log import get_logger
+
+logger = get_logger()
 
 celery_app = Celery()
 celery_app.config_from_object(celeryconfig)
+
+
+@worker_process_init.connect
+def reset_db_pools(**kwargs: Any) -> None:
+    # connections opened by the parent process must not be shared with forked worker processes
+    engine.dispose(close=False)
+    engine_admin.dispose(close=False)
+    for native_pool in native_pools.values():
+        native_pool.reset()
+
+
+# tracking tokens and start times of tasks running in this worker process, by task id
+_task_query_tracking: dict[str, Token] = {}
+_task_start_times: dict[str, float] = {}
+
+
+@task_prerun.connect
+def start_task_tracking(task_id: str, task: Any, **kwargs: Any) -> None:
+    _task_query_tracking[task_id] = start_tracking(task.name)
+    _task_start_times[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def stop_task_tracking(task_id: str, task: Any, state: Optional[str] = None, **kwargs: Any) -> None:
+    start_time = _task_start_times.pop(task_id, None)
+    if start_time is not None:
+        celery_task_runtime.observe(time.perf_counter() - start_time, task=task.name, state=str(state))
+
+    token = _task_query_tracking.pop(task_id, None)
+    if token is None:
+        return
+    stats = stop_tracking(token)
+    if stats is not None:
+        logger.info(f"Task {stats.name} executed {stats.statements} statements in {stats.db_time:.3f} s, "
+                    f"pool: {pool_status('default')}")
+
+
+@task_failure.connect
+def count_task_failure(sender: Any, exception: BaseException, **kwargs: Any) -> None:
+    celery_task_failures.inc(task=sender.name, exception=type(exception).__name__)
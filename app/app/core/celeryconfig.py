@@ -13,3 +13,9 @@ imports = (
     'app.tasks.recalculate_classification_scores',
     'app.tasks.set_race_in_progress',
 )
+beat_schedule = {
+    'reconcile-classification-scores': {
+        'task': 'app.tasks.recalculate_classification_scores.reconcile_classification_scores',
+        'schedule': float(os.environ.get("CELERY_SCORE_RECONCILIATION_INTERVAL_SECONDS", default=6 * 60 * 60)),
+    },
+}
@@ -1,7 +1,11 @@
 import os
+import threading
+from enum import Enum
+from typing import Optional
 
 from sqlalchemy import create_engine
 from sqlalchemy.engine import URL, Engine
+from sqlalchemy.pool import NullPool
 import sys
 import oracledb
 
@@ -35,10 +39,130 @@ db_url_admin = URL.create(
 )
 
 
-# TODO disable echo if not in devel / test mode
-def create_db_engine(echo: bool = True) -> Engine:
-    return create_engine(db_url, echo=echo)
+# logs every statement, for debugging only - use `FASTAPI_SLOW_QUERY_THRESHOLD_MS` to find slow queries
+DB_ECHO = os.environ.get("FASTAPI_DB_ECHO", default="false").lower() in ("1", "true")
 
 
-def create_db_engine_admin(echo: bool = True) -> Engine:
-    return create_engine(db_url_admin, echo=echo)
+class ProcessType(Enum):
+    api = "api"
+    worker = "worker"
+
+
+class DbPoolEngine(Enum):
+    sqlalchemy = "sqlalchemy"  # SQLAlchemy's QueuePool
+    oracledb = "oracledb"  # oracledb's native session pool, optionally using DRCP
+
+
+PROCESS_TYPE = ProcessType(os.environ.get("FASTAPI_PROCESS_TYPE", default=ProcessType.api.value))
+
+# API serves many concurrent requests, a worker process runs a single task at a time
+_DEFAULT_POOL_SIZES = {
+    ProcessType.api: (10, 10),
+    ProcessType.worker: (1, 2),
+}
+
+DB_POOL_ENGINE = DbPoolEngine(os.environ.get("FASTAPI_DB_POOL_ENGINE", default=DbPoolEngine.sqlalchemy.value))
+DB_POOL_SIZE = int(os.environ.get("FASTAPI_DB_POOL_SIZE", default=str(_DEFAULT_POOL_SIZES[PROCESS_TYPE][0])))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get(
+    "FASTAPI_DB_POOL_MAX_OVERFLOW", default=str(_DEFAULT_POOL_SIZES[PROCESS_TYPE][1])))
+# seconds to wait for a free connection before failing
+DB_POOL_TIMEOUT = int(os.environ.get("FASTAPI_DB_POOL_TIMEOUT", default="30"))
+# connections older than this are replaced, before firewalls or the DB drop them silently
+DB_POOL_RECYCLE = int(os.environ.get("FASTAPI_DB_POOL_RECYCLE", default="1800"))
+# DRCP connection class, set to use Database Resident Connection Pooling (`oracledb` pool engine only)
+DB_DRCP_CLASS = os.environ.get("FASTAPI_DB_DRCP_CLASS")
+
+
+def _create_engine(url: URL, echo: bool, name: str) -> Engine:
+    if DB_POOL_ENGINE == DbPoolEngine.oracledb:
+        pool = NativePool(url)
+        native_pools[name] = pool
+        # pooling is done by oracledb, SQLAlchemy only acquires and releases its connections
+        return create_engine("oracle+oracledb://", creator=pool.acquire, poolclass=NullPool, echo=echo)
+
+    return create_engine(
+        url,
+        echo=echo,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+def create_native_pool(url: URL) -> oracledb.ConnectionPool:
+    drcp_params = dict(server_type="pooled", cclass=DB_DRCP_CLASS, purity=oracledb.PURITY_SELF) if DB_DRCP_CLASS \
+        else {}
+    pool = oracledb.create_pool(
+        user=url.username,
+        password=url.password,
+        host=url.host,
+        port=url.port,
+        sid=url.database,
+        min=DB_POOL_SIZE,
+        max=DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW,
+        increment=1,
+        getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+        wait_timeout=DB_POOL_TIMEOUT * 1000,
+        max_lifetime_session=DB_POOL_RECYCLE,
+        ping_interval=60,
+        **drcp_params
+    )
+    return pool
+
+
+class NativePool:
+    """
+    oracledb session pool of a single process, created on first use. Processes forked after that (Celery workers)
+    create their own instead of sharing the parent's sockets.
+    """
+
+    def __init__(self, url: URL):
+        self.url = url
+        self.min = DB_POOL_SIZE
+        self.max = DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW
+        self._pool: Optional[oracledb.ConnectionPool] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> oracledb.Connection:
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = create_native_pool(self.url)
+                self._pid = os.getpid()
+            pool = self._pool
+        return pool.acquire()
+
+    def reset(self) -> None:
+        """
+        Forget the pool without closing it - after a fork its connections belong to the parent process.
+        """
+        with self._lock:
+            self._pool = None
+            self._pid = None
+
+    @property
+    def busy(self) -> int:
+        pool = self._current()
+        return pool.busy if pool is not None else 0
+
+    @property
+    def opened(self) -> int:
+        pool = self._current()
+        return pool.opened if pool is not None else 0
+
+    def _current(self) -> Optional[oracledb.ConnectionPool]:
+        return self._pool if self._pid == os.getpid() else None
+
+
+# native pools of engines by name, for reporting their status
+native_pools: dict[str, NativePool] = {}
+
+
+def create_db_engine(echo: bool = DB_ECHO) -> Engine:
+    return _create_engine(db_url, echo=echo, name="default")
+
+
+def create_db_engine_admin(echo: bool = DB_ECHO) -> Engine:
+    return _create_engine(db_url_admin, echo=echo, name="admin")
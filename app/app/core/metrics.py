@@ -0,0 +1,156 @@
+import time
+from typing import Any, Callable, Iterable, Optional, TYPE_CHECKING
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+from app.core.redis import redis_client
+from app.util.metrics import registry, Counter, Gauge, Histogram, RedisStore
+
+if TYPE_CHECKING:
+    from app.core.config import NativePool
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests by route template.",
+    labelnames=("method", "route", "status")
+))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests being processed.",
+    labelnames=("method",)
+))
+http_request_db_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request by route template.",
+    labelnames=("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+))
+
+gpx_job_queue_wait = registry.register(Histogram(
+    "gpx_job_queue_wait_seconds", "Time GPX jobs of upload handlers wait for a free worker thread.",
+    labelnames=("job",)
+))
+gpx_job_duration = registry.register(Histogram(
+    "gpx_job_duration_seconds", "Time GPX jobs of upload handlers run in a worker thread.",
+    labelnames=("job",)
+))
+
+db_pool_checkouts = registry.register(Counter(
+    "db_pool_checkouts", "Connections checked out from the pool.",
+    labelnames=("pool",)
+))
+db_pool_connects = registry.register(Counter(
+    "db_pool_connects", "New DB connections opened by the pool.",
+    labelnames=("pool",)
+))
+db_pool_invalidations = registry.register(Counter(
+    "db_pool_invalidations", "Pooled DB connections invalidated after an error.",
+    labelnames=("pool",)
+))
+db_pool_checkout_duration = registry.register(Histogram(
+    "db_pool_checkout_duration_seconds", "Time connections stay checked out of the pool.",
+    labelnames=("pool",)
+))
+
+_pools: dict[str, Pool] = {}
+_pool_max_overflow: dict[str, int] = {}
+_native_pools: dict[str, "NativePool"] = {}
+
+
+def pool_status(name: str) -> Optional[dict[str, int]]:
+    """
+    Size (connections kept open), checked out connections, overflow (connections open over the size, negative while
+    the pool is not filled yet) and capacity (maximum number of connections) of a pool, None if the pool does not
+    limit connections (e.g. in tests).
+    """
+    native_pool = _native_pools.get(name)
+    if native_pool is not None:
+        return {
+            "size": native_pool.min,
+            "checked_out": native_pool.busy,
+            "overflow": native_pool.opened - native_pool.min,
+            "capacity": native_pool.max,
+        }
+
+    pool = _pools.get(name)
+    if not isinstance(pool, QueuePool):
+        return None
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "capacity": pool.size() + _pool_max_overflow.get(name, 0),
+    }
+
+
+def _pool_gauge(field: str) -> Callable[[], Iterable[tuple[dict[str, str], float]]]:
+    def collect() -> Iterable[tuple[dict[str, str], float]]:
+        statuses = {name: pool_status(name) for name in _pools.keys() | _native_pools.keys()}
+        return [({"pool": name}, status[field]) for name, status in statuses.items() if status is not None]
+    return collect
+
+
+db_pool_size = registry.register(Gauge(
+    "db_pool_size", "Connections kept open by the pool.",
+    labelnames=("pool",), callback=_pool_gauge("size")
+))
+db_pool_capacity = registry.register(Gauge(
+    "db_pool_capacity", "Maximum number of connections of the pool, including overflow.",
+    labelnames=("pool",), callback=_pool_gauge("capacity")
+))
+db_pool_checked_out = registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool.",
+    labelnames=("pool",), callback=_pool_gauge("checked_out")
+))
+db_pool_overflow = registry.register(Gauge(
+    "db_pool_overflow", "Connections open over the pool size (negative while the pool is not full yet).",
+    labelnames=("pool",), callback=_pool_gauge("overflow")
+))
+
+# Celery tasks run in worker processes, their metrics are collected in Redis to be rendered by the API
+_celery_store = RedisStore(redis_client, "metrics:celery")
+
+celery_task_runtime = registry.register(Histogram(
+    "celery_task_runtime_seconds", "Runtime of Celery tasks by final state.",
+    labelnames=("task", "state"), store=_celery_store,
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+))
+celery_task_failures = registry.register(Counter(
+    "celery_task_failures", "Celery tasks which raised an exception.",
+    labelnames=("task", "exception"), store=_celery_store
+))
+
+
+def instrument_pool(
+        engine: Engine,
+        name: str,
+        max_overflow: int,
+        native_pool: Optional["NativePool"] = None
+) -> None:
+    """
+    Count connection pool events of `engine` and report its status as `name`, `max_overflow` being the one the pool was
+    configured with. With `native_pool`, the engine only acquires connections from it and its status is reported
+    instead.
+    """
+    _pools[name] = engine.pool
+    _pool_max_overflow[name] = max_overflow
+    if native_pool is not None:
+        _native_pools[name] = native_pool
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection: Any, connection_record: Any) -> None:
+        db_pool_connects.inc(pool=name)
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+        db_pool_checkouts.inc(pool=name)
+        connection_record.info["checkout_time"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection: Any, connection_record: Any) -> None:
+        checkout_time = connection_record.info.pop("checkout_time", None)
+        if checkout_time is not None:
+            db_pool_checkout_duration.observe(time.perf_counter() - checkout_time, pool=name)
+
+    @event.listens_for(engine, "invalidate")
+    def invalidate(dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+        db_pool_invalidations.inc(pool=name)
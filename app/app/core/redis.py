@@ -0,0 +1,8 @@
+import os
+
+import redis
+
+redis_url = os.environ.get("FASTAPI_REDIS_URL", default=os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+
+# connections are opened lazily, on first command
+redis_client: redis.Redis = redis.Redis.from_url(redis_url)  # type: ignore[func-returns-value, assignment]
@@ -0,0 +1,63 @@
+from typing import Any
+
+from sqlalchemy import Select, and_, case, func, literal
+from sqlmodel import select
+
+from app.models.account import Account
+from app.models.bike import Bike
+from app.models.classification import ClassificationPredicate
+from app.models.race_participation import RaceParticipation, RaceParticipationStatus
+
+# given to participations without an overall place
+UNPLACED_PLACE = 99999
+
+
+def participation_conditions(predicate: ClassificationPredicate) -> list[Any]:
+    """
+    WHERE clauses of `predicate` on participations joined with their `Bike` and rider's `Account`. Empty if the
+    predicate admits everyone.
+    """
+    conditions = []
+    if predicate.bike_type is not None:
+        conditions.append(Bike.type == predicate.bike_type)
+    if predicate.gender is not None:
+        conditions.append(Account.gender == predicate.gender)
+    return conditions
+
+
+def classification_places(race_id: int, classification_id: int, predicate: ClassificationPredicate) -> Select:
+    """
+    Places of approved participations of a race admitted by `predicate`, as (`classification_id`,
+    `race_participation_id`, `place`). A place is the overall one minus the number of participations placed before
+    and not admitted, participations without an overall place get `UNPLACED_PLACE`.
+    """
+    conditions = participation_conditions(predicate)
+    admitted = case((and_(*conditions), 1), else_=0) if conditions else literal(1)  # type: ignore[arg-type]
+
+    placed = RaceParticipation.place_assigned_overall
+    order = (case((placed == None, 1), else_=0), placed, RaceParticipation.id)  # type: ignore[arg-type] # noqa: E711
+    ranked = (
+        select(  # type: ignore[call-overload]
+            RaceParticipation.id.label("id"),  # type: ignore[union-attr]
+            placed.label("placed"),  # type: ignore[union-attr]
+            admitted.label("admitted"),
+            func.sum(1 - admitted).over(order_by=order).label("skipped")
+        )
+        .join(Bike, Bike.id == RaceParticipation.bike_id)  # type: ignore[arg-type]
+        .join(Account, Account.id == RaceParticipation.rider_id)  # type: ignore[arg-type]
+        .where(
+            RaceParticipation.race_id == race_id,
+            RaceParticipation.status == RaceParticipationStatus.approved
+        )
+        .subquery()
+    )
+
+    return (
+        select(  # type: ignore[call-overload]
+            literal(classification_id).label("clasification_id"),
+            ranked.c.id.label("race_participation_id"),
+            case((ranked.c.placed == None, UNPLACED_PLACE),  # noqa: E711
+                 else_=ranked.c.placed - ranked.c.skipped).label("place")
+        )
+        .where(ranked.c.admitted == 1)
+    )
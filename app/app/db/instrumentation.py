@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from contextvars import ContextVar, Token
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.util.log import get_logger
+
+logger = get_logger()
+
+# statements running longer are logged along with their bind parameters, negative value disables the log
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("FASTAPI_SLOW_QUERY_THRESHOLD_MS", default="500"))
+
+# longer statements are truncated in aggregates
+_STATEMENT_PREVIEW_LENGTH = 300
+
+
+class QueryStats:
+    """
+    Statements executed within a single request or Celery task.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.statements = 0
+        self.db_time = 0.
+        self.slowest_time = 0.
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.db_time += duration
+        if duration >= self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+
+class QueryMetrics:
+    """
+    Process-wide aggregates of `QueryStats`, keyed by route template or task name.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._aggregates: dict[str, dict[str, Any]] = {}
+
+    def add(self, stats: QueryStats) -> None:
+        with self._lock:
+            aggregate = self._aggregates.setdefault(stats.name, {
+                "count": 0,
+                "statements": 0,
+                "max_statements": 0,
+                "db_time_seconds": 0.,
+                "slowest_statement_seconds": 0.,
+                "slowest_statement": None,
+            })
+            aggregate["count"] += 1
+            aggregate["statements"] += stats.statements
+            aggregate["max_statements"] = max(aggregate["max_statements"], stats.statements)
+            aggregate["db_time_seconds"] += stats.db_time
+            if stats.slowest_statement is not None and stats.slowest_time >= aggregate["slowest_statement_seconds"]:
+                aggregate["slowest_statement_seconds"] = stats.slowest_time
+                aggregate["slowest_statement"] = stats.slowest_statement[:_STATEMENT_PREVIEW_LENGTH]
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {name: dict(aggregate) for name, aggregate in self._aggregates.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._aggregates.clear()
+
+
+query_metrics = QueryMetrics()
+
+# copied into worker threads by anyio and Starlette, so statements of thread-offloaded sessions are counted too
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_tracking(name: str) -> Token:
+    """
+    Start collecting statements executed in the current context under `name`. Returns a token for `stop_tracking`.
+    """
+    return _current_stats.set(QueryStats(name))
+
+
+def stop_tracking(token: Token, name: Optional[str] = None) -> Optional[QueryStats]:
+    """
+    Stop collecting statements and add them to `query_metrics`. `name` overrides the one given to `start_tracking`,
+    e.g. once the route template is known.
+    """
+    stats = _current_stats.get()
+    _current_stats.reset(token)
+    if stats is None:
+        return None
+    if name is not None:
+        stats.name = name
+    query_metrics.add(stats)
+    return stats
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time every statement executed by `engine`, record it in the current request / task and log slow ones.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                              executemany: bool) -> None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                             executemany: bool) -> None:
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+
+        if 0 <= SLOW_QUERY_THRESHOLD_MS <= duration * 1000:
+            logger.warning(
+                f"Slow query ({duration * 1000:.1f} ms) in {stats.name if stats else 'unknown context'}: "
+                f"{statement} parameters: {parameters!r}")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context: Any) -> None:
+        # after_cursor_execute is not called for failed statements. `context.cursor` is never set by SQLAlchemy 2.0,
+        # the execution context is only there for errors raised while executing a statement
+        if context.connection is not None and context.execution_context is not None:
+            start_times = context.connection.info.get("query_start_time")
+            if start_times:
+                start_times.pop()
@@ -0,0 +1,30 @@
+from sqlalchemy import Subquery, func
+from sqlmodel import select
+
+from app.models.account import Account
+from app.models.rider_classification_link import RiderClassificationLink
+
+
+def classification_standings(classification_ids: list[int]) -> Subquery:
+    """
+    Entries of given classifications with rider names. Columns: `classification_id`, `rider_id`, `score`, `name`,
+    `surname`, `username`, `rank` (equal for equal scores) and `position` (unique, in display order), both computed
+    within a classification.
+    """
+    partition = RiderClassificationLink.classification_id
+    order = (RiderClassificationLink.score.desc(), RiderClassificationLink.rider_id)  # type: ignore[attr-defined]
+    return (
+        select(  # type: ignore[call-overload]
+            RiderClassificationLink.classification_id,
+            RiderClassificationLink.rider_id,
+            RiderClassificationLink.score,
+            Account.name,
+            Account.surname,
+            Account.username,
+            func.rank().over(partition_by=partition, order_by=order[0]).label("rank"),
+            func.row_number().over(partition_by=partition, order_by=order).label("position")
+        )
+        .join(Account, Account.id == RiderClassificationLink.rider_id)  # type: ignore[arg-type]
+        .where(RiderClassificationLink.classification_id.in_(classification_ids))  # type: ignore[union-attr]
+        .subquery()
+    )
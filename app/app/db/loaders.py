@@ -0,0 +1,30 @@
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
+
+from app.models.race import Race
+from app.models.rider import Rider
+from app.models.race_participation import RaceParticipation
+
+
+def participation_rider_names() -> tuple[LoaderOption, ...]:
+    """
+    Loader options for participations serialized with rider names (`RaceParticipationListReadNames`) - rider and
+    account are joined, instead of two lazy loads per participation.
+    """
+    return (
+        joinedload(RaceParticipation.rider).joinedload(Rider.account),  # type: ignore[arg-type]
+    )
+
+
+def race_detail() -> tuple[LoaderOption, ...]:
+    """
+    Loader options for races serialized with season, bonuses and participations with rider names
+    (`RaceReadDetailCoordinator`).
+    """
+    return (
+        joinedload(Race.season),  # type: ignore[arg-type]
+        selectinload(Race.bonuses),  # type: ignore[arg-type]
+        selectinload(Race.race_participations)  # type: ignore[arg-type]
+        .joinedload(RaceParticipation.rider)  # type: ignore[arg-type]
+        .joinedload(Rider.account),  # type: ignore[arg-type]
+    )
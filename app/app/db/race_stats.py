@@ -0,0 +1,37 @@
+from typing import Optional
+
+from sqlalchemy import Subquery, case, func
+from sqlmodel import select
+
+from app.models.race import RaceStatus
+from app.models.race_participation import RaceParticipation
+
+
+def race_participation_stats(rider_id: Optional[int] = None) -> Subquery:
+    """
+    Participation counts per race, to be outer joined with races in list queries instead of loading participations.
+    Columns: `race_id`, `participation_count`, `assigned_count` (participations with assigned place) and, if
+    `rider_id` is given, `participation_status` of that rider.
+    """
+    columns = [
+        RaceParticipation.race_id,
+        func.count().label("participation_count"),
+        func.count(RaceParticipation.place_assigned_overall).label("assigned_count"),
+    ]
+    if rider_id is not None:
+        columns.append(func.min(case(
+            (RaceParticipation.rider_id == rider_id, RaceParticipation.status)  # type: ignore[arg-type]
+        )).label("participation_status"))
+
+    return (
+        select(*columns)  # type: ignore[call-overload]
+        .group_by(RaceParticipation.race_id)
+        .subquery()
+    )
+
+
+def is_race_approved(status: RaceStatus, participation_count: Optional[int], assigned_count: Optional[int]) -> bool:
+    """
+    Race results are approved once places are assigned, races which ended with no participants count as approved.
+    """
+    return bool(assigned_count) or (status == RaceStatus.ended and not participation_count)
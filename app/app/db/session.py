@@ -1,17 +1,32 @@
-from typing import Generator, Any
+import os
+import functools
+from contextlib import contextmanager
+from typing import Generator, Any, Callable, Iterator, Optional, Sequence, TypeVar
 
+import anyio
+from fastapi import Depends
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session
+from sqlmodel.sql.expression import SelectOfScalar
 
-from app.core.config import create_db_engine, create_db_engine_admin
+from app.core.config import create_db_engine, create_db_engine_admin, native_pools, DB_POOL_SIZE, \
+    DB_POOL_MAX_OVERFLOW
+from app.core.metrics import instrument_pool
+from app.db.instrumentation import instrument_engine
 
 # ATTENTION PLEASE! SQLModel does not include `sessionmaker`, yet we want to use SQLModel's Session class (it is
 # different from SQLAlchemy's session!) for proper ORM handling. We can hack the sessionmaker by passing the Session
 # class as `class_` attribute
 engine = create_db_engine()
+instrument_engine(engine)
+instrument_pool(engine, name="default", max_overflow=DB_POOL_MAX_OVERFLOW,
+                native_pool=native_pools.get("default"))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=Session)  # type: ignore[type-var]
 
 engine_admin = create_db_engine_admin()
+instrument_engine(engine_admin)
+instrument_pool(engine_admin, name="admin", max_overflow=DB_POOL_MAX_OVERFLOW,
+                native_pool=native_pools.get("admin"))
 SessionLocalAdmin = sessionmaker(autocommit=False, autoflush=False, bind=engine_admin,
                                  class_=Session)  # type: ignore[type-var]
 
@@ -22,3 +37,68 @@ def get_db() -> Generator[Session, Any, None]:
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def task_session(db: Optional[Session] = None) -> Iterator[Session]:
+    """
+    Session of a Celery task - `db` if given (it is then owned by the caller, e.g. a test or another task), otherwise
+    a new one, closed when the task is done so its connection returns to the pool.
+    """
+    if db is not None:
+        yield db
+        return
+
+    with SessionLocal() as session:
+        yield session
+
+
+_T = TypeVar("_T")
+
+# number of threads running DB calls of async routes - more than the capacity of the connection pool would only make
+# threads wait for a connection
+ASYNC_DB_THREADS = int(os.environ.get("FASTAPI_ASYNC_DB_THREADS", default=str(DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)))
+
+_async_db_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def get_async_db_limiter() -> anyio.CapacityLimiter:
+    # has to be created from within the event loop
+    global _async_db_limiter
+    if _async_db_limiter is None:
+        _async_db_limiter = anyio.CapacityLimiter(ASYNC_DB_THREADS)
+    return _async_db_limiter
+
+
+class ThreadedAsyncSession:
+    """
+    Awaitable facade over the synchronous SQLModel session. Every call is run in a worker thread, so DB round trips
+    don't block the event loop. Results are fully fetched in the thread - anything which may lazy-load relationships
+    has to be done inside `run_sync`.
+    """
+
+    def __init__(self, sync_session: Session, limiter: anyio.CapacityLimiter):
+        self.sync_session = sync_session
+        self._limiter = limiter
+
+    async def run_sync(self, fn: Callable[..., _T], *args: Any) -> _T:
+        """
+        Call `fn(sync_session, *args)` in a worker thread.
+        """
+        return await anyio.to_thread.run_sync(functools.partial(fn, self.sync_session, *args), limiter=self._limiter)
+
+    async def all(self, statement: SelectOfScalar[_T]) -> Sequence[_T]:
+        return await self.run_sync(lambda session: session.exec(statement).all())
+
+    async def first(self, statement: SelectOfScalar[_T]) -> Optional[_T]:
+        return await self.run_sync(lambda session: session.exec(statement).first())
+
+    async def get(self, entity: type[_T], ident: Any) -> Optional[_T]:
+        return await self.run_sync(lambda session: session.get(entity, ident))
+
+
+async def get_async_db(db: Session = Depends(get_db)) -> ThreadedAsyncSession:
+    """
+    Async counterpart of `get_db`. Wraps the same session, so overriding `get_db` overrides this one too.
+    """
+    return ThreadedAsyncSession(db, get_async_db_limiter())
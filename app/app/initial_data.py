@@ -2,13 +2,13 @@ from datetime import datetime, timedelta
 
 from sqlmodel import SQLModel
 
-from app.models.account import Account
+from app.models.account import Account, Gender
 from app.models.bike import Bike, BikeType
 from app.models.season import Season
 from app.models.race import Race, RaceStatus, RaceTemperature, RaceRain
 from app.models.race_bonus import RaceBonus
 from app.models.race_participation import RaceParticipation, RaceParticipationStatus
-from app.models.classification import Classification
+from app.models.classification import Classification, ClassificationPredicate
 from app.models.ride_participation_classification_place import RiderParticipationClassificationPlace
 from app.models.rider_classification_link import RiderClassificationLink
 from app.models.rider import Rider
@@ -189,59 +189,69 @@ def create_initial_data(
     general_classification = Classification(
         name="Klasyfikacja generalna",
         description="Bez ograniczeń.",
+        predicate_json=ClassificationPredicate().to_json(),
         season=season_1,
     )
 
     road_classification = Classification(
         name="Szosa",
         description="Rowery szosowe z przerzutkami.",
+        predicate_json=ClassificationPredicate(bike_type=BikeType.road).to_json(),
         season=season_1,
     )
 
     fixie_classification = Classification(
         name="Ostre koło",
         description="Rowery typu fixie i singlespeed. Brak przerzutek.",
+        predicate_json=ClassificationPredicate(bike_type=BikeType.fixie).to_json(),
         season=season_1,
     )
 
     men_classification = Classification(
         name="Mężczyźni",
         description="Klasyfikacja mężczyzn.",
+        predicate_json=ClassificationPredicate(gender=Gender.male).to_json(),
         season=season_1,
     )
 
     women_classification = Classification(
         name="Kobiety",
         description="Klasyfikacja kobiet.",
+        predicate_json=ClassificationPredicate(gender=Gender.female).to_json(),
         season=season_1,
     )
 
     rider_classification_link = RiderClassificationLink(
         score=400,
+        points=400,
         rider=rider_account.rider,
         classification=general_classification
     )
 
     second_rider_classification_link = RiderClassificationLink(
         score=420,
+        points=420,
         rider=second_rider_account.rider,
         classification=general_classification
     )
 
     third_rider_classification_link = RiderClassificationLink(
         score=300,
+        points=300,
         rider=third_rider_account.rider,
         classification=general_classification
     )
 
     fourth_rider_classification_link = RiderClassificationLink(
         score=200,
+        points=200,
         rider=fourth_rider_account.rider,
         classification=general_classification
     )
 
     rider_classification_link_men = RiderClassificationLink(
         score=1000,
+        points=1000,
         rider=rider_account.rider,
         classification=men_classification
     )
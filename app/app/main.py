@@ -1,8 +1,13 @@
 import os
+import time
+from typing import Awaitable, Callable
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from app.api.api import api_router
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.core.metrics import http_request_duration, http_requests_in_progress, http_request_db_statements
+from app.db.instrumentation import start_tracking, stop_tracking
 from app.util.log import get_logger
 
 logger = get_logger()
@@ -23,6 +28,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "HEAD", "OPTIONS", "PATCH", "DELETE"],
     allow_headers=["Access-Control-Allow-Headers", 'Content-Type', 'Authorization', 'Access-Control-Allow-Origin'],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(api_router, prefix=api_prefix)
+
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    token = start_tracking(request.url.path)
+    http_requests_in_progress.inc(method=request.method)
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_requests_in_progress.dec(method=request.method)
+        # aggregate by route template rather than by path with ids in it
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_request_duration.observe(time.perf_counter() - start_time,
+                                      method=request.method, route=route, status=str(status))
+
+        stats = stop_tracking(token, name=f"{request.method} {route}")
+        if stats is not None:
+            http_request_db_statements.observe(stats.statements, method=request.method, route=route)
+            if stats.statements:
+                logger.debug(f"{stats.name} executed {stats.statements} statements in {stats.db_time:.3f} s")
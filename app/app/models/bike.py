@@ -1,7 +1,7 @@
 from typing import Optional, TYPE_CHECKING
 from enum import Enum
 
-from sqlmodel import Field, SQLModel, Relationship, CheckConstraint
+from sqlmodel import Field, SQLModel, Relationship, CheckConstraint, Index
 
 if TYPE_CHECKING:
     from .rider import Rider
@@ -15,6 +15,8 @@ class BikeType(Enum):
 
 
 class Bike(SQLModel, table=True):
+    __table_args__ = (Index("ix_bike_rider_id_id", "rider_id", "id"),)
+
     id: Optional[int] = Field(primary_key=True, default=None)
     name: str = Field(max_length=80)
     type: BikeType = Field(sa_column_args=(
@@ -1,7 +1,15 @@
-from typing import Optional, TYPE_CHECKING
+import json
 
+from datetime import datetime
+from typing import Any, NamedTuple, Optional, TYPE_CHECKING
+
+import jsonschema
+
+from sqlalchemy import text
 from sqlmodel import Field, SQLModel, Relationship
 
+from .bike import BikeType
+from .account import Gender
 from .rider_classification_link import RiderClassificationLink  # noqa: F811,
 
 if TYPE_CHECKING:
@@ -11,10 +19,55 @@ if TYPE_CHECKING:
     from .rider_classification_link import RiderClassificationLink  # noqa F811
 
 
+predicate_json_schema = {
+    "type": "object",
+    "properties": {
+        "bike_type": {"enum": [t.value for t in BikeType]},
+        "gender": {"enum": [g.value for g in Gender]},
+    },
+    "additionalProperties": False
+}
+
+
+class ClassificationPredicate(NamedTuple):
+    """
+    Participations ranked in a classification. Unset fields don't restrict, so an empty predicate admits everyone.
+    """
+    bike_type: Optional[BikeType] = None
+    gender: Optional[Gender] = None
+
+    @classmethod
+    def from_json(cls, predicate_json: str) -> "ClassificationPredicate":
+        predicate: dict[str, Any] = json.loads(predicate_json)
+        jsonschema.validate(predicate, predicate_json_schema)
+        return cls(
+            bike_type=BikeType(predicate["bike_type"]) if "bike_type" in predicate else None,
+            gender=Gender(predicate["gender"]) if "gender" in predicate else None
+        )
+
+    def admits_gender(self, gender: Optional[Gender]) -> bool:
+        """
+        Whether riders of `gender` are eligible - riders are eligible for classifications of every bike type, they only
+        get places in them with a matching bike.
+        """
+        return self.gender is None or self.gender == gender
+
+    def to_json(self) -> str:
+        return json.dumps({field: value.value for field, value in self._asdict().items() if value is not None})
+
+
 class Classification(SQLModel, table=True):
     id: Optional[int] = Field(primary_key=True, default=None)
     name: str = Field(max_length=80)
     description: str = Field(max_length=512)
+    # classifications without a predicate are not ranked by race results, for schema see `predicate_json_schema`
+    predicate_json: Optional[str] = Field(max_length=512, default=None)
+    # set on every change, versions cached classifications of other processes (see `ClassificationRegistry`). Updates
+    # outside the ORM are stamped by the `classification_updated_timestamp` trigger
+    updated_timestamp: datetime = Field(default_factory=datetime.now, sa_column_kwargs={
+        "server_default": text("CURRENT_TIMESTAMP"),
+        "onupdate": datetime.now
+    })
 
     season_id: int = Field(foreign_key="season.id")
     season: "Season" = Relationship(back_populates="classifications")
@@ -8,7 +8,7 @@ import jsonschema
 
 from pydantic import validator
 
-from sqlmodel import Field, SQLModel, Relationship, CheckConstraint
+from sqlmodel import Field, SQLModel, Relationship, CheckConstraint, Index
 
 from .race_bonus_race_link import RaceBonusRaceLink
 
@@ -62,6 +62,8 @@ place_to_points_mapping_json_schema = {
 
 
 class Race(SQLModel, table=True):
+    __table_args__ = (Index("ix_race_start_timestamp_id", "start_timestamp", "id"),)
+
     id: Optional[int] = Field(primary_key=True, default=None)
     status: RaceStatus = Field(sa_column_args=(
         CheckConstraint("status in ('pending', 'in_progress', 'ended', 'cancelled')", name="race_status_enum"),
@@ -99,6 +101,9 @@ class Race(SQLModel, table=True):
 
     celery_task_id: Optional[str] = Field(max_length=256)
 
+    # set once points of the race are included in classification scores, either incrementally or by a full recompute
+    classification_scores_applied: bool = Field(default=False)
+
     season_id: int = Field(foreign_key="season.id")
     season: "Season" = Relationship(back_populates="races")
     bonuses: list["RaceBonus"] = Relationship(
@@ -2,7 +2,7 @@ from typing import Optional, TYPE_CHECKING
 from datetime import datetime, timedelta
 from enum import Enum
 
-from sqlmodel import SQLModel, Field, Relationship, CheckConstraint
+from sqlmodel import SQLModel, Field, Relationship, CheckConstraint, Index
 
 if TYPE_CHECKING:
     from .rider import Rider
@@ -18,6 +18,8 @@ class RaceParticipationStatus(Enum):
 
 
 class RaceParticipation(SQLModel, table=True):
+    __table_args__ = (Index("ix_participation_race_id_id", "race_id", "id"),)
+
     id: Optional[int] = Field(primary_key=True, default=None)
     status: RaceParticipationStatus = Field(sa_column_args=(
         CheckConstraint("status in ('pending', 'approved', 'rejected')", name="race_participation_status_enum"),
@@ -73,6 +75,23 @@ class RaceParticipationListReadNames(RaceParticipationCoordinatorListRead):
     time_seconds: Optional[timedelta]
     ride_gpx_file: Optional[str]
 
+    @classmethod
+    def from_participation(cls, participation: RaceParticipation) -> "RaceParticipationListReadNames":
+        """
+        Unlike `from_orm` with `update`, which reads every attribute of the participation (lazy loading all of its
+        relationships), reads only the fields of this model - rider and account should be eagerly loaded.
+        """
+        account = participation.rider.account
+        return cls(
+            **{name: getattr(participation, name) for name in RaceParticipationCoordinatorListRead.__fields__},
+            rider_name=account.name,
+            rider_surname=account.surname,
+            rider_username=account.username,
+            time_seconds=participation.ride_end_timestamp - participation.ride_start_timestamp if (
+                    participation.ride_start_timestamp and participation.ride_end_timestamp) else None,
+            ride_gpx_file=participation.ride_gpx_file
+        )
+
 
 class RaceParticipationAssignPlaceListUpdate(SQLModel):
     id: int
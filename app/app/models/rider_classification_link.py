@@ -11,6 +11,8 @@ class RiderClassificationLink(SQLModel, table=True):
     score: int = Field(sa_column_args=(
         CheckConstraint("score >= 0", name="rider_classification_link_score_non_negative"),
     ), default=0)
+    # unrounded sum of points, `score` is this rounded - kept so incremental updates round the season total only once
+    points: float = Field(default=0.)
 
     rider_id: Optional[int] = Field(
         foreign_key="rider.id", primary_key=True, default=None
@@ -35,3 +37,8 @@ class RiderClassificationLinkRiderDetails(SQLModel):
     name: str
     surname: str
     username: str
+
+
+class RiderClassificationLinkLeaderboardEntry(RiderClassificationLinkRiderDetails):
+    rider_id: int
+    rank: int
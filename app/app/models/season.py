@@ -2,7 +2,7 @@ from typing import Optional, TYPE_CHECKING
 
 from datetime import datetime
 
-from sqlmodel import Field, SQLModel, Relationship, CheckConstraint
+from sqlmodel import Field, SQLModel, Relationship, CheckConstraint, Index
 
 if TYPE_CHECKING:
     from .classification import Classification
@@ -10,6 +10,8 @@ if TYPE_CHECKING:
 
 
 class Season(SQLModel, table=True):
+    __table_args__ = (Index("ix_season_start_timestamp_id", "start_timestamp", "id"),)
+
     id: Optional[int] = Field(primary_key=True, default=None)
     name: str = Field(max_length=80, unique=True)
     start_timestamp: datetime
@@ -1,65 +1,71 @@
 from typing import Optional
 from datetime import datetime
 
-from sqlmodel import Session, select
-from sqlmodel.sql.expression import SelectOfScalar
+from sqlalchemy import text, update
+from sqlmodel import Session
 
 from app.core.celery import celery_app
-from app.db.session import get_db
+from app.db.session import task_session
 from app.models.race import Race, RaceStatus
-from app.models.race_participation import RaceParticipation, RaceParticipationStatus
+from app.models.race_participation import RaceParticipationStatus
 from app.util.log import get_logger
 
 logger = get_logger()
 
+# Ranks approved participations of a race by end timestamp and writes the places back in one pass. RANK() gives equal
+# end timestamps the same place and skips the following ones, i.e. 1, 2, 2, 4. Riders without a recorded end are
+# stamped with `:now`, and ranked as such. Oracle does not allow window functions in UPDATE ... SET, so the ranking is
+# joined in with MERGE rather than read from a correlated subquery, which would be evaluated for every updated row.
+MERGE_GENERATED_PLACES_SQL = """
+MERGE INTO raceparticipation p
+USING (
+    SELECT rp.id,
+           NVL(rp.ride_end_timestamp, :now) AS ride_end_timestamp,
+           RANK() OVER (ORDER BY NVL(rp.ride_end_timestamp, :now)) AS place
+    FROM raceparticipation rp
+    WHERE rp.race_id = :race_id
+      AND rp.status = :participation_approved
+) ranked
+ON (p.id = ranked.id)
+WHEN MATCHED THEN UPDATE SET
+    p.ride_end_timestamp = ranked.ride_end_timestamp,
+    p.place_generated_overall = ranked.place
+"""
+
 
 @celery_app.task()
 def end_race_and_generate_places(
     race_id: int,
     db: Optional[Session] = None
 ) -> None:
-    if not db:
-        db = next(get_db())
-
-    logger.info(f"Assigning places for race {race_id}")
-    race = db.get(Race, race_id)
-
-    if not race:
-        raise ValueError(f"Race {race_id} not found")
-
-    race.status = RaceStatus.ended
+    with task_session(db) as db:
+        logger.info(f"Assigning places for race {race_id}")
 
-    stmt: SelectOfScalar = (
-        select(RaceParticipation)
-        .where(
-            RaceParticipation.race_id == race.id,
-            RaceParticipation.status == RaceParticipationStatus.approved
+        result = db.execute(
+            update(Race)
+            .where(Race.id == race_id)  # type: ignore[arg-type]
+            .values(status=RaceStatus.ended)
+            .execution_options(synchronize_session=False)
         )
-    )
-    participations = db.exec(stmt).all()
 
-    now = datetime.now()
+        if result.rowcount != 1:  # type: ignore[attr-defined]
+            raise ValueError(f"Race {race_id} not found")
 
-    for p in participations:
-        if not p.ride_end_timestamp:
-            p.ride_end_timestamp = now
-            db.add(p)
+        generate_places(race_id=race_id, db=db)
 
-    db.commit()
-    db.refresh(race)
+        # expires loaded races and participations, so callers see the new status and places
+        db.commit()
 
-    prev_timestamp = None
-    prev_place = 1
-    for i, p in enumerate(sorted(participations, key=lambda p: p.ride_end_timestamp), start=1):
-        if p.ride_end_timestamp == prev_timestamp:
-            p.place_generated_overall = prev_place
-        else:
-            p.place_generated_overall = i
-        db.add(p)
-        prev_timestamp = p.ride_end_timestamp
-        prev_place = p.place_generated_overall
+        logger.info("Task done!")
 
-    db.add(race)
-    db.commit()
 
-    logger.info("Task done!")
+def generate_places(race_id: int, db: Session) -> None:
+    """
+    Rank approved participations of a race by end timestamp. Not committed, so callers end the race and store its
+    places in one transaction.
+    """
+    db.execute(text(MERGE_GENERATED_PLACES_SQL), {
+        "race_id": race_id,
+        "now": datetime.now(),
+        "participation_approved": RaceParticipationStatus.approved.name
+    })
@@ -1,21 +1,36 @@
-from typing import Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 
-import gpxo
 import numpy as np
-import pandas as pd
-from scipy.signal import argrelmin
+from sqlalchemy import update
 from sqlmodel import Session, select
 from sqlmodel.sql.expression import SelectOfScalar
 
 from app.core.celery import celery_app
-from app.tasks.generate_race_places import end_race_and_generate_places
-from app.db.session import get_db
-from app.models.race import Race
+from app.tasks.generate_race_places import generate_places
+from app.db.session import task_session
+from app.models.race import Race, RaceStatus
 from app.models.race_participation import RaceParticipation, RaceParticipationStatus
+from app.util.gpx.finish_detection import FINISH_DISTANCE_THRESHOLD, FinishDetectionEngine, detect_finish_timestamp
+from app.util.gpx.reader import GpxTrack, read_gpx_track
+from app.util.gpx.route_cache import route_cache, read_route
 from app.util.log import get_logger
 
-FINISH_DISTANCE_THRESHOLD = 0.00015
+if TYPE_CHECKING:
+    import gpxo
+
+FINISH_DETECTION_ENGINE = FinishDetectionEngine(
+    os.environ.get("FASTAPI_FINISH_DETECTION_ENGINE", default=FinishDetectionEngine.numpy.value)
+)
+
+# recordings of a batch are parsed in this many threads, parsing only partly releases the GIL so more threads help
+# little past a few; 1 parses in the worker thread
+SUBMISSION_PARSE_THREADS = int(os.environ.get("FASTAPI_SUBMISSION_PARSE_THREADS", default="1"))
+
+# uploads wait this long before they are processed, so that results submitted together are processed in one batch
+SUBMISSION_BATCH_DELAY_SECONDS = int(os.environ.get("FASTAPI_SUBMISSION_BATCH_DELAY_SECONDS", default="10"))
 
 logger = get_logger()
 
@@ -29,75 +44,215 @@ def process_race_result_submission(
 ) -> None:
     logger.info(f"Received participation task for race_id={race_id}, rider_id={rider_id}")
 
-    if not db:
-        db = next(get_db())
+    with task_session(db) as db:
+        race = db.get(Race, race_id)
 
-    race = db.get(Race, race_id)
+        if not race:
+            raise ValueError(f"Race {race_id} not found")
+
+        stmt: SelectOfScalar = (
+            select(RaceParticipation)
+            .where(
+                RaceParticipation.race_id == race_id,
+                RaceParticipation.rider_id == rider_id
+            )
+        )
+        race_participation = db.exec(stmt).first()
+
+        if not race_participation:
+            raise ValueError(f"Race participation for race_id={race_id} ider_id{rider_id} not found")
+
+        track = read_route(race.checkpoints_gpx_file)
+        logger.info(f"Route cache stats: {route_cache.stats()}")
+
+        start_timestamp, end_timestamp = compute_ride_timestamps(
+            recording_filepath=recording_filepath,
+            end_point=track.end_point,
+            no_laps=race.no_laps,
+            fallback_start_timestamp=race.start_timestamp
+        )
 
-    if not race:
-        raise ValueError(f"Race {race_id} not found")
+        race_participation.ride_start_timestamp = start_timestamp
+        race_participation.ride_end_timestamp = end_timestamp
+        race_participation.ride_gpx_file = recording_filepath
 
-    stmt: SelectOfScalar = (
-        select(RaceParticipation)
+        db.add(race_participation)
+        db.commit()
+        db.refresh(race_participation)
+
+        logger.info("Task done!")
+
+        if claim_race_end(race_id=race_id, db=db):
+            logger.info(f"Looks like all riders finished race {race_id} - closing and assigning places.")
+            generate_places(race_id=race_id, db=db)
+            db.commit()
+
+        return
+
+
+@celery_app.task()
+def process_race_result_submissions_batch(
+        race_id: int,
+        db: Optional[Session] = None
+) -> None:
+    """
+    Process all submitted, not yet processed recordings of a race in one pass - the route is loaded once, recordings
+    are parsed in up to `SUBMISSION_PARSE_THREADS` threads, all timestamps are written with one UPDATE and the race
+    end is checked once. Submissions being processed by a concurrent run are skipped, so every upload can enqueue a run
+    and the first one picks up all of them.
+    """
+    logger.info(f"Received batch participation task for race_id={race_id}")
+
+    with task_session(db) as db:
+        race = db.get(Race, race_id)
+
+        if not race:
+            raise ValueError(f"Race {race_id} not found")
+
+        # rows stay locked until the timestamps are committed
+        stmt: SelectOfScalar = (
+            select(RaceParticipation)
+            .where(
+                RaceParticipation.race_id == race_id,
+                RaceParticipation.ride_gpx_file != None,  # noqa: E711
+                RaceParticipation.ride_end_timestamp == None  # noqa: E711
+            )
+            .with_for_update(skip_locked=True)
+        )
+        submissions = db.exec(stmt).all()
+
+        if not submissions:
+            logger.info(f"No pending submissions for race_id={race_id}")
+            db.rollback()
+            return
+
+        track = read_route(race.checkpoints_gpx_file)
+        logger.info(f"Route cache stats: {route_cache.stats()}")
+
+        paths = [participation.ride_gpx_file for participation in submissions]
+        args = ([track.end_point] * len(paths), [race.no_laps] * len(paths), [race.start_timestamp] * len(paths))
+        if SUBMISSION_PARSE_THREADS > 1 and len(paths) > 1:
+            with ThreadPoolExecutor(max_workers=min(SUBMISSION_PARSE_THREADS, len(paths))) as executor:
+                timestamps = list(executor.map(compute_ride_timestamps, paths, *args))
+        else:
+            timestamps = list(map(compute_ride_timestamps, paths, *args))
+
+        db.execute(update(RaceParticipation), [
+            {
+                "id": participation.id,
+                "ride_start_timestamp": start_timestamp,
+                "ride_end_timestamp": end_timestamp
+            } for participation, (start_timestamp, end_timestamp) in zip(submissions, timestamps)
+        ])
+        db.commit()
+
+        logger.info(f"Task done! Processed {len(submissions)} submissions")
+
+        if claim_race_end(race_id=race_id, db=db):
+            logger.info(f"Looks like all riders finished race {race_id} - closing and assigning places.")
+            generate_places(race_id=race_id, db=db)
+            db.commit()
+
+
+def claim_race_end(race_id: int, db: Session) -> bool:
+    """
+    Atomically mark the race as ended if every approved participation has an end timestamp. Returns True only for
+    the caller whose UPDATE flipped the status, so when final submissions commit concurrently, places are generated
+    exactly once.
+
+    The UPDATE is not committed - the caller generates places in the same transaction, so if that fails the race is
+    rolled back to in progress and claimed again by a retry or the next submission.
+    """
+    unfinished = (
+        select(RaceParticipation.id)
         .where(
             RaceParticipation.race_id == race_id,
-            RaceParticipation.rider_id == rider_id
+            RaceParticipation.status == RaceParticipationStatus.approved,
+            RaceParticipation.ride_end_timestamp == None  # noqa: E711
+        )
+        .exists()
+    )
+    result = db.execute(
+        update(Race)
+        .where(
+            Race.id == race_id,  # type: ignore[arg-type]
+            Race.status == RaceStatus.in_progress,  # type: ignore[arg-type]
+            ~unfinished
         )
+        .values(status=RaceStatus.ended)
+        .execution_options(synchronize_session=False)
     )
-    race_participation = db.exec(stmt).first()
 
-    if not race_participation:
-        raise ValueError(f"Race participation for race_id={race_id} ider_id{rider_id} not found")
+    return result.rowcount == 1  # type: ignore[attr-defined]
+
 
-    recording = gpxo.Track(recording_filepath)
-    track = gpxo.Track(race.checkpoints_gpx_file)
+def compute_ride_timestamps(
+        recording_filepath: str,
+        end_point: np.ndarray,
+        no_laps: int,
+        fallback_start_timestamp: datetime
+) -> tuple[datetime, datetime]:
+    """
+    Read ride start and end from a recording, falling back to race start and now() if the recording cannot be
+    processed.
+    """
+    recording = read_gpx_track(recording_filepath)
 
     try:
-        start_timestamp = recording.data.head(1).index.to_pydatetime()[0]
+        start_timestamp = get_start_timestamp(recording)
     except (ValueError, IndexError, KeyError, TypeError) as e:
         logger.warning(
-            f"Could not read start timestamp for participation race_id={race_id}, rider_id={rider_id}, "
-            f"file={recording_filepath}. Falling back to race start.\n" + repr(
-                e))
-        start_timestamp = race.start_timestamp
+            f"Could not read start timestamp for file={recording_filepath}. Falling back to race start.\n" + repr(e))
+        start_timestamp = fallback_start_timestamp
 
     try:
-        end_point = track.data.tail(1)[['latitude (°)', 'longitude (°)']].values.T.squeeze()
-        end_timestamp = interpolate_end_timestamp(recording=recording, end_point=end_point, no_laps=race.no_laps)
+        end_timestamp = find_end_timestamp(recording=recording, end_point=end_point, no_laps=no_laps)
     except (ValueError, IndexError, KeyError, TypeError) as e:
         logger.warning(
-            f"Could not interpolate end timestamp for participation race_id={race_id}, rider_id={rider_id}, "
-            f"file={recording_filepath}. Falling back to now().\n" + repr(
-                e))
+            f"Could not interpolate end timestamp for file={recording_filepath}. Falling back to now().\n" + repr(e))
         end_timestamp = datetime.now()
 
-    race_participation.ride_start_timestamp = start_timestamp
-    race_participation.ride_end_timestamp = end_timestamp
-    race_participation.ride_gpx_file = recording_filepath
+    return start_timestamp, end_timestamp
 
-    db.add(race_participation)
-    db.commit()
-    db.refresh(race_participation)
 
-    logger.info("Task done!")
+def get_start_timestamp(recording: GpxTrack) -> datetime:
+    if not recording.has_time:
+        raise ValueError('GPX processing error: recording has no timestamps')
+
+    return recording.time[0].astype('datetime64[us]').item()
 
-    stmt = (
-        select(RaceParticipation)
-        .where(
-            RaceParticipation.race_id == race_id,
-            RaceParticipation.status == RaceParticipationStatus.approved
-        )
-    )
-    all_participations = db.exec(stmt).all()
 
-    if all([p.ride_end_timestamp is not None for p in all_participations]):
-        logger.info(f"Looks like all riders finished race {race_id} - closing and assigning places.")
-        end_race_and_generate_places(race_id=race_id, db=db)
+def find_end_timestamp(
+        recording: GpxTrack,
+        end_point: np.ndarray,
+        no_laps: int,
+        engine: FinishDetectionEngine = FINISH_DETECTION_ENGINE
+) -> datetime:
+    if engine == FinishDetectionEngine.dataframe:
+        import gpxo
+
+        return interpolate_end_timestamp(recording=gpxo.Track(recording.path), end_point=end_point, no_laps=no_laps)
+
+    if not recording.has_time:
+        raise ValueError('GPX processing error: recording has no timestamps')
+
+    return detect_finish_timestamp(
+        latitude=recording.latitude,
+        longitude=recording.longitude,
+        time=recording.time,
+        end_point=end_point,
+        no_laps=no_laps
+    )
 
-    return
 
+def interpolate_end_timestamp(recording: "gpxo.Track", end_point: np.ndarray, no_laps: int) -> datetime:
+    """
+    Reference (dataframe-based) finish detection. Kept for equivalence checks against `detect_finish_timestamp`.
+    """
+    # pandas and scipy are only needed by this engine, importing them with the module would slow down API startup
+    import pandas as pd
+    from scipy.signal import argrelmin
 
-def interpolate_end_timestamp(recording: gpxo.Track, end_point: np.ndarray, no_laps: int) -> datetime:
     if end_point.shape != (2,):
         raise ValueError(f'GPX processing error: end point coordinates have wrong shape ({end_point.shape})')
 
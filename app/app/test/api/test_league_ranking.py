@@ -3,9 +3,10 @@ import datetime
 from fastapi.encoders import jsonable_encoder
 
 from app.models.rider import RiderRead
-from app.models.classification import ClassificationRead
+from app.models.classification import Classification, ClassificationRead
 from app.models.season import SeasonRead
-from app.models.rider_classification_link import RiderClassificationLinkRead, RiderClassificationLinkRiderDetails
+from app.models.rider_classification_link import RiderClassificationLink, RiderClassificationLinkRead, \
+    RiderClassificationLinkRiderDetails
 from app.test.fixtures import NOVEMBER_TIME
 
 
@@ -102,3 +103,41 @@ def test_rider_race_no_participations_404(
 ):
     response = rider1_client.get("/api/rider/race/3048304/participations/all")
     assert response.status_code == 404
+
+
+def test_rider_classification_link_leaderboard(rider1_client, db, season_1, rider1, rider2, rider3, rider4):
+    classification = Classification(name="Open", description="", season=season_1)
+    for rider, score in ((rider1, 20), (rider2, 50), (rider3, 20), (rider4, 5)):
+        RiderClassificationLink(score=score, rider=rider, classification=classification)
+    db.add(classification)
+    db.commit()
+
+    response = rider1_client.get(f"/api/rider/rider_classification_link/{classification.id}/leaderboard")
+    assert response.status_code == 200
+    assert [(e["rider_id"], e["score"], e["rank"]) for e in response.json()] == [
+        (rider2.id, 50, 1),
+        *sorted([(rider1.id, 20, 2), (rider3.id, 20, 2)]),
+        (rider4.id, 5, 4),
+    ]
+    assert response.json()[0]["username"] == rider2.account.username
+
+    response = rider1_client.get(
+        f"/api/rider/rider_classification_link/{classification.id}/leaderboard?limit=2&offset=2")
+    assert [e["rank"] for e in response.json()] == [2, 4]
+
+    response = rider1_client.get(f"/api/rider/rider_classification_link/{classification.id}/leaderboard?around=0")
+    assert [e["rider_id"] for e in response.json()] == [rider1.id]
+
+    response = rider1_client.get(f"/api/rider/rider_classification_link/{classification.id}/leaderboard?around=1")
+    assert len(response.json()) == 3
+    assert rider1.id in [e["rider_id"] for e in response.json()]
+
+
+def test_rider_classification_link_leaderboard_around_not_classified_404(
+        rider1_client,
+        classification_without_rider,
+        db):
+    response = rider1_client.get(
+        f"/api/rider/rider_classification_link/{classification_without_rider.id}/leaderboard?around=2"
+    )
+    assert response.status_code == 404
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+import app.core.config as config_module
+from app.core.config import NativePool, db_url
+from app.db.instrumentation import query_metrics
+
+
+def test_admin_query_metrics(admin_client, db):
+    query_metrics.clear()
+
+    response = admin_client.get("/api/db")
+    assert response.status_code == 200
+
+    response = admin_client.get("/api/admin/metrics/queries")
+    assert response.status_code == 200
+    metrics = response.json()["GET /api/db"]
+    assert metrics["count"] == 1
+    assert metrics["statements"] >= 1
+    assert metrics["slowest_statement"].startswith("SELECT")
+
+
+def test_admin_pool_metrics(admin_client, db):
+    response = admin_client.get("/api/admin/metrics/pools")
+    assert response.status_code == 200
+    pool = response.json()["default"]
+    assert pool["capacity"] >= pool["size"] > 0
+    assert pool["checked_out"] <= pool["capacity"]
+
+
+class _FakeConnectionPool:
+    busy = 1
+    opened = 2
+
+    def acquire(self):
+        return self
+
+
+def test_native_pool_created_per_process(monkeypatch):
+    created = []
+    pid = 100
+
+    def create_native_pool(url):
+        created.append(pid)
+        return _FakeConnectionPool()
+
+    monkeypatch.setattr(config_module, 'create_native_pool', create_native_pool)
+    monkeypatch.setattr(config_module.os, 'getpid', lambda: pid)
+    pool = NativePool(db_url)
+
+    # nothing is connected until the first connection is needed
+    assert created == [] and pool.busy == 0
+    pool.acquire()
+    pool.acquire()
+    assert created == [100] and pool.busy == 1
+
+    # a forked process does not use the parent's pool
+    pid = 101
+    assert pool.opened == 0
+    pool.acquire()
+    assert created == [100, 101]
+
+    pool.reset()
+    pool.acquire()
+    assert created == [100, 101, 101]
+
+
+def test_admin_query_metrics_forbidden(rider1_client, db):
+    response = rider1_client.get("/api/admin/metrics/queries")
+    assert response.status_code == 403
+
+
+def test_prometheus_metrics(client_unauthenticated, db):
+    response = client_unauthenticated.get("/api/db")
+    assert response.status_code == 200
+
+    response = client_unauthenticated.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/db",status="200"}' in response.text
+    assert "# TYPE celery_task_runtime_seconds histogram" in response.text
+
+
+def test_failed_statement_raises_database_error(db):
+    # timing of the failed statement is dropped, the original error is not masked by instrumentation
+    with pytest.raises(DBAPIError):
+        db.execute(text("SELECT * FROM no_such_table"))
+    db.rollback()
+
+    assert not db.connection().info.get("query_start_time")
@@ -15,6 +15,22 @@ def test_coordinator_list_races(coordinator_client, db, race_pending, race_ended
     ]
 
 
+def test_coordinator_list_races_approval(coordinator_client, db, race_ended_with_rider_and_multiple_participations):
+    race, participations, _, _ = race_ended_with_rider_and_multiple_participations
+
+    response = coordinator_client.get("/api/coordinator/race")
+    assert response.status_code == 200
+    assert [r["is_approved"] for r in response.json() if r["id"] == race.id] == [False]
+
+    participations[0].place_assigned_overall = 1
+    db.add(participations[0])
+    db.commit()
+
+    response = coordinator_client.get("/api/coordinator/race")
+    assert response.status_code == 200
+    assert [r["is_approved"] for r in response.json() if r["id"] == race.id] == [True]
+
+
 def test_coordinator_race_detail(coordinator_client, db, race_pending):
     response = coordinator_client.get(f"/api/coordinator/race/{race_pending.id}")
     assert response.status_code == 200
@@ -22,6 +38,22 @@ def test_coordinator_race_detail(coordinator_client, db, race_pending):
                                                                                   update={"is_approved": False}))
 
 
+def test_coordinator_race_detail_statement_count(
+        coordinator_client, db, race_ended_with_rider_and_multiple_participations, assert_statement_count
+):
+    race, participations, riders, bikes = race_ended_with_rider_and_multiple_participations
+    race_id = race.id
+
+    # current user's account and coordinator, then race with season, bonuses and participations with riders and
+    # accounts - independent of number of participants
+    with assert_statement_count(5):
+        response = coordinator_client.get(f"/api/coordinator/race/{race_id}")
+
+    assert response.status_code == 200
+    assert {p["rider_username"] for p in response.json()["race_participations"]} == {
+        r.account.username for r in riders}
+
+
 def test_coordinator_race_detail_404(coordinator_client, db):
     response = coordinator_client.get("/api/coordinator/race/54654246")
     assert response.status_code == 404
@@ -48,6 +80,23 @@ def test_coordinator_create_race(coordinator_client, db, season_1,
     assert response.status_code == 200
 
 
+@pytest.mark.parametrize("trackpoints", [
+    "",
+    # open route, the finish is far from the start
+    '<trkpt lat="52.2" lon="21.0"></trkpt><trkpt lat="52.3" lon="21.1"></trkpt>',
+])
+def test_coordinator_upload_route_invalid_400(coordinator_client, db, tmp_path, trackpoints):
+    path = tmp_path / "route.gpx"
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+                    f'<trk><trkseg>{trackpoints}</trkseg></trk></gpx>')
+
+    response = coordinator_client.post("/api/coordinator/race/create/upload-route/",
+                                       data={"fileobj.path": str(path), "name": "route.gpx"})
+
+    assert response.status_code == 400
+
+
 def test_coordinator_create_race_timestamp_order(coordinator_client, db, season_1,
                                                  disable_celery_tasks):
     response = coordinator_client.post("/api/coordinator/race/create",
@@ -365,3 +414,18 @@ def test_race_assign_places_skip_unapproved(
     assert all([p.place_assigned_overall == id_to_place_mapping[p.id] for p in race.race_participations if
                 p.status == RaceParticipationStatus.approved])
     assert participations[2].place_assigned_overall is None
+
+
+def test_race_assign_places_statement_count(
+        race_ended_with_rider_and_multiple_participations, db, coordinator_client,
+        disable_celery_tasks, assert_statement_count
+):
+    race, participations, riders, bikes = race_ended_with_rider_and_multiple_participations
+    json = [{'id': p.id, 'place_assigned_overall': place} for place, p in enumerate(participations, start=1)]
+    race_id = race.id
+
+    # participations, batched update of places, participations after commit
+    with assert_statement_count(3):
+        response = coordinator_client.patch(f"/api/coordinator/race/{race_id}/participations", json=json)
+
+    assert response.status_code == 200
@@ -2,6 +2,7 @@ import shutil
 
 import pytest
 
+from app.tasks.process_race_result_submission import process_race_result_submissions_batch
 from app.models.race import RaceStatus
 from app.models.race_participation import RaceParticipationStatus
 
@@ -16,12 +17,22 @@ def test_submit_race_result(
 
     race, participation, rider, bike = race_in_progress_with_rider_and_participation
 
+    scheduled = []
+    monkeypatch.setattr(process_race_result_submissions_batch, 'apply_async',
+                        lambda kwargs, countdown: scheduled.append(kwargs["race_id"]))
+
     response = rider1_client.post(
         f"/api/rider/race/{race.id}/upload-result",
         data={"fileobj.path": sample_ride_gpx}
     )
 
     assert response.status_code == 202
+    assert scheduled == [race.id]
+
+    # the recording is processed with the race's other submissions
+    db.refresh(participation)
+    assert participation.ride_gpx_file.startswith('/attachments/')
+    assert participation.ride_end_timestamp is None
 
 
 @pytest.mark.parametrize("client,code",
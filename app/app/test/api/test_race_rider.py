@@ -215,3 +215,17 @@ def test_rider_race_withdraw_race_ended(rider1_client, db, race_ended, rider1):
 def test_rider_race_withdraw_race_404(rider1_client, db, rider1):
     response = rider1_client.post("/api/rider/race/475645/withdraw", )
     assert response.status_code == 404
+
+
+def test_rider_race_all_participations_statement_count(
+        rider1_client, db, race_ended_with_rider_and_multiple_participations, assert_statement_count
+):
+    race, participations, riders, bikes = race_ended_with_rider_and_multiple_participations
+    race_id = race.id
+
+    # current user's account and rider, then participations with riders and accounts
+    with assert_statement_count(3):
+        response = rider1_client.get(f"/api/rider/race/{race_id}/participation/all")
+
+    assert response.status_code == 200
+    assert {p["rider_username"] for p in response.json()} == {r.account.username for r in riders}
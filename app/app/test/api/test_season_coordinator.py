@@ -13,6 +13,29 @@ def test_coordinator_list_seasons(coordinator_client, db, season_1, season_2):
         (season_2, season_1)]
 
 
+def test_coordinator_list_seasons_cursor(coordinator_client, db, season_1, season_2):
+    expected_ids = [entry['id'] for entry in coordinator_client.get("/api/coordinator/season",
+                                                                    params={"limit": 1000}).json()]
+
+    ids = []
+    params = {"limit": 1}
+    while True:
+        response = coordinator_client.get("/api/coordinator/season", params=params)
+        assert response.status_code == 200
+        ids += [entry['id'] for entry in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert ids == expected_ids
+    assert season_2.id in ids and season_1.id in ids
+
+
+def test_coordinator_list_seasons_invalid_cursor_400(coordinator_client, db):
+    response = coordinator_client.get("/api/coordinator/season", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
 def test_coordinator_season_detail(coordinator_client, db, season_1):
     response = coordinator_client.get(f"/api/coordinator/season/{season_1.id}")
     assert response.status_code == 200
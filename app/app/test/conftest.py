@@ -7,6 +7,7 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.sql import text
 
 from app.db.session import create_db_engine, get_db
+from app.db.instrumentation import instrument_engine
 from app.main import app
 
 from app.test.fixtures import *  # noqa: F401,F403
@@ -44,6 +45,7 @@ class TestIdSequences:
 @pytest.fixture(scope="session")
 def db_engine() -> Generator[Engine, Any, None]:
     test_engine = create_db_engine(echo=False)
+    instrument_engine(test_engine)
 
     yield test_engine
 
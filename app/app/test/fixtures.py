@@ -4,29 +4,34 @@ import os
 import uuid
 from typing import Generator, Any, Iterable, Callable, Optional
 import datetime
+from contextlib import contextmanager
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlmodel import select, Session
 from sqlmodel.sql.expression import SelectOfScalar
 
 from app.core.users import get_user_manager, get_user_db, current_active_user
-from app.tasks.process_race_result_submission import process_race_result_submission
-from app.tasks.recalculate_classification_scores import recalculate_classification_scores
+from app.tasks.process_race_result_submission import process_race_result_submission, \
+    process_race_result_submissions_batch
+from app.tasks.recalculate_classification_scores import recalculate_classification_scores, \
+    apply_race_classification_scores, run_pending_classification_recalculation
 from app.tasks.assign_places_in_classifications import assign_places_in_classifications
 from app.tasks.generate_race_places import end_race_and_generate_places
 from app.tasks.set_race_in_progress import set_race_in_progress
 
-from app.models.account import Account, AccountCreate, AccountType
+from app.models.account import Account, AccountCreate, AccountType, Gender
 from app.models.rider import Rider
 from app.models.bike import Bike, BikeType
 from app.models.season import Season
 from app.models.race import Race, RaceStatus, RaceTemperature, RaceRain
 from app.models.race_participation import RaceParticipation, RaceParticipationStatus
 from app.models.race_bonus import RaceBonus
-from app.models.classification import Classification
+from app.models.classification import Classification, ClassificationPredicate
 from app.models.ride_participation_classification_place import RiderParticipationClassificationPlace
 from app.models.rider_classification_link import RiderClassificationLink, RiderClassificationLinkRiderDetails
+from app.util.classification_registry import classification_registry
 
 from app.main import app
 
@@ -585,13 +590,43 @@ def sample_ride_gpx() -> Generator[str, Any, None]:
         pass  # if removed by some other function
 
 
+@pytest.fixture(scope="function")
+def assert_statement_count(db):
+    """
+    Context manager asserting the number of SQL statements executed within it, e.g. by a request. Savepoint handling is
+    not counted.
+    """
+    engine = db.get_bind().engine
+
+    @contextmanager
+    def assert_count(expected: int):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if not statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO")):
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert len(statements) == expected, "\n\n".join(statements)
+
+    return assert_count
+
+
 @pytest.fixture(scope="function")
 def disable_celery_tasks(monkeypatch):
     for task in [
         assign_places_in_classifications,
         end_race_and_generate_places,
         process_race_result_submission,
+        process_race_result_submissions_batch,
         recalculate_classification_scores,
+        apply_race_classification_scores,
+        run_pending_classification_recalculation,
         set_race_in_progress
     ]:
         monkeypatch.setattr(task, 'delay', lambda *args, **kwargs: None)
@@ -693,32 +728,40 @@ def classifications(season_1, db) -> Generator[dict[str, Classification], Any, N
         "general": Classification(
             name="Klasyfikacja generalna",
             description="Bez ograniczeń.",
+            predicate_json=ClassificationPredicate().to_json(),
             season=season_1,
         ),
         "road": Classification(
             name="Szosa",
             description="Rowery szosowe z przerzutkami.",
+            predicate_json=ClassificationPredicate(bike_type=BikeType.road).to_json(),
             season=season_1,
         ),
         "fixie": Classification(
             name="Ostre koło",
             description="Rowery typu fixie i singlespeed. Brak przerzutek.",
+            predicate_json=ClassificationPredicate(bike_type=BikeType.fixie).to_json(),
             season=season_1,
         ),
         "men": Classification(
             name="Mężczyźni",
             description="Klasyfikacja mężczyzn.",
+            predicate_json=ClassificationPredicate(gender=Gender.male).to_json(),
             season=season_1,
         ),
         "women": Classification(
             name="Kobiety",
             description="Klasyfikacja kobiet.",
+            predicate_json=ClassificationPredicate(gender=Gender.female).to_json(),
             season=season_1,
         )
     }
     db.add_all(classifications.values())
     db.commit()
+    # season ids are reused across tests, as every test is rolled back
+    classification_registry.clear()
     yield classifications
+    classification_registry.clear()
 
 
 @pytest.fixture(scope="function")
@@ -1,7 +1,10 @@
 import pytest
 from sqlmodel import select
 
+import app.tasks.assign_places_in_classifications as assign_places_in_classifications_module
 from app.tasks.assign_places_in_classifications import assign_places_in_classifications
+from app.tasks.recalculate_classification_scores import ClassificationScoringMode
+from app.db.classification_places import UNPLACED_PLACE
 from app.models.race_participation import RaceParticipationStatus
 from app.models.ride_participation_classification_place import RiderParticipationClassificationPlace
 from app.models.bike import BikeType
@@ -200,3 +203,66 @@ def test_assign_classification_places_skip_unapproved(
 
     assert len(entries) == 3
     assert all([e.place == place_expected for e, place_expected in zip(entries, classification_places)])
+
+
+def test_assign_classification_places_constant_statements(
+        race_ended, riders_with_bikes, race_participations_factory, classifications, db, disable_celery_tasks,
+        assert_statement_count, monkeypatch
+):
+    monkeypatch.setattr(assign_places_in_classifications_module, 'CLASSIFICATION_SCORING_MODE',
+                        ClassificationScoringMode.incremental)
+    (r1, r2, r3, r4), (b1, b2, b3, b4) = riders_with_bikes
+
+    participations = race_participations_factory(
+        race=race_ended,
+        riders=(r1, r2, r3, r4),
+        bikes=(b1, b2, b3, b4),
+        statuses=[RaceParticipationStatus.approved for _ in range(4)],
+        entry_kwargs=[{'place_assigned_overall': p} for p in [3, 1, 4, 2]]
+    )
+    race_id = race_ended.id
+
+    # version and rows of ranked classifications and one INSERT ... SELECT per classification (the race is already
+    # loaded in the session)
+    with assert_statement_count(2 + len(classifications)):
+        assign_places_in_classifications(race_id=race_id, db=db)
+
+    entries = db.exec(
+        select(RiderParticipationClassificationPlace).where(
+            RiderParticipationClassificationPlace.race_participation_id.in_([p.id for p in participations])
+        )
+    ).all()
+    # every participation is in the general classification, one of the bike classifications and (with gender set)
+    # one of the gender classifications
+    assert len(entries) == 4 + sum(1 for b in (b1, b2, b3, b4) if b.type in (BikeType.road, BikeType.fixie)) \
+        + sum(1 for r in (r1, r2, r3, r4) if r.account.gender in (Gender.male, Gender.female))
+
+
+def test_assign_classification_places_only_ranked_classifications(
+        race_ended, riders_with_bikes, race_participations_factory, classifications, classification_without_rider, db
+):
+    (r1, r2, r3, r4), (b1, b2, b3, b4) = riders_with_bikes
+
+    participations = race_participations_factory(
+        race=race_ended,
+        riders=(r1, r2, r3, r4),
+        bikes=(b1, b2, b3, b4),
+        statuses=[RaceParticipationStatus.approved for _ in range(4)],
+        entry_kwargs=[{'place_assigned_overall': p} for p in [3, 1, None, 2]]
+    )
+
+    assign_places_in_classifications(race_id=race_ended.id, db=db)
+
+    # classifications without a predicate are not ranked by race results
+    assert not db.exec(
+        select(RiderParticipationClassificationPlace).where(
+            RiderParticipationClassificationPlace.classification == classification_without_rider
+        )
+    ).all()
+
+    general = {e.race_participation_id: e.place for e in db.exec(
+        select(RiderParticipationClassificationPlace).where(
+            RiderParticipationClassificationPlace.classification == classifications['general']
+        )
+    ).all()}
+    assert [general[p.id] for p in participations] == [3, 1, UNPLACED_PLACE, 2]
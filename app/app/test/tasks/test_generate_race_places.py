@@ -144,3 +144,19 @@ def test_race_generate_places_no_timestamps(
         [db.get(RaceParticipation, p.id).place_generated_overall == 1 for p in participations]
     )
     assert race.status == RaceStatus.ended
+
+
+def test_race_generate_places_constant_statements(
+        race_in_progress_with_rider_and_multiple_participations, db, assert_statement_count
+):
+    race, participations, riders, bikes = race_in_progress_with_rider_and_multiple_participations
+    race_id = race.id
+
+    # race status and all places are written with one UPDATE each, regardless of the number of participations
+    with assert_statement_count(2):
+        end_race_and_generate_places(race_id=race_id, db=db)
+
+
+def test_race_generate_places_race_not_found(db):
+    with pytest.raises(ValueError):
+        end_race_and_generate_places(race_id=-1, db=db)
@@ -1,10 +1,17 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import shutil
 
 import pytest
 import gpxo
 import numpy as np
 
-from app.tasks.process_race_result_submission import process_race_result_submission, interpolate_end_timestamp
+import app.tasks.process_race_result_submission as process_race_result_submission_module
+from app.tasks.process_race_result_submission import process_race_result_submission, interpolate_end_timestamp, \
+    find_end_timestamp, process_race_result_submissions_batch, claim_race_end
+from app.models.race import RaceStatus
+from app.util.gpx.finish_detection import FinishDetectionEngine, detect_finish_timestamp
+from app.util.gpx.reader import read_gpx_track
 
 
 def test_end_point_interpolation(
@@ -48,6 +55,59 @@ def test_end_point_interpolation_broken_race_end(
         interpolate_end_timestamp(ride, track_end, no_laps=99)
 
 
+def detect_with_both_engines(recording_path, end_point, no_laps):
+    results = []
+    for engine in FinishDetectionEngine:
+        try:
+            results.append(find_end_timestamp(read_gpx_track(recording_path), end_point, no_laps=no_laps,
+                                              engine=engine))
+        except ValueError:
+            results.append(None)
+    return results
+
+
+@pytest.mark.parametrize("no_laps", [1, 2, 3, 4, 99])
+@pytest.mark.parametrize("end_point", ["ride_last", "ride_first", "route_end", "route_start", "far_away"])
+def test_end_point_detection_engines_equivalent(
+        sample_ride_gpx, sample_track_gpx, no_laps, end_point
+):
+    ride = read_gpx_track(sample_ride_gpx)
+    route = read_gpx_track(sample_track_gpx)
+    end_point = {
+        "ride_last": np.array([ride.latitude[-1], ride.longitude[-1]]),
+        "ride_first": np.array([ride.latitude[0], ride.longitude[0]]),
+        "route_end": route.end_point,
+        "route_start": route.start_point,
+        "far_away": np.array([0., 0.]),
+    }[end_point]
+
+    detected, reference = detect_with_both_engines(sample_ride_gpx, end_point, no_laps)
+
+    # both engines pick the same lap, or both reject the recording
+    if reference is None or detected is None:
+        assert detected is None and reference is None
+    else:
+        assert abs(detected - reference) < timedelta(milliseconds=1)
+
+
+def test_end_point_detection_too_many_laps(
+        sample_ride_gpx
+):
+    ride = read_gpx_track(sample_ride_gpx)
+    track_end = np.array([52.219954, 21.011319])  # last trackpoint in file
+    with pytest.raises(ValueError):
+        detect_finish_timestamp(ride.latitude, ride.longitude, ride.time, track_end, no_laps=99)
+
+
+def test_end_point_detection_broken_race_end(
+        sample_ride_gpx
+):
+    ride = read_gpx_track(sample_ride_gpx)
+    track_end = np.array([0., 0.])
+    with pytest.raises(ValueError):
+        detect_finish_timestamp(ride.latitude, ride.longitude, ride.time, track_end, no_laps=1)
+
+
 def test_process_submission(
         race_in_progress_with_rider_and_participation,
         db, sample_ride_gpx, sample_track_gpx):
@@ -118,3 +178,127 @@ def test_process_fallback_strategy(
 
     assert participation.ride_start_timestamp == race.start_timestamp
     assert participation.ride_end_timestamp >= now.replace(microsecond=0)
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_process_submissions_batch(
+        race_in_progress_with_rider_and_multiple_participations,
+        db, sample_ride_gpx, monkeypatch, threads):
+    race, participations, riders, bikes = race_in_progress_with_rider_and_multiple_participations
+    monkeypatch.setattr(process_race_result_submission_module, 'SUBMISSION_PARSE_THREADS', threads)
+
+    for participation in participations:
+        path = f'/attachments/test_recording_{participation.rider_id}.gpx'
+        shutil.copy2(sample_ride_gpx, path)
+        participation.ride_gpx_file = path
+        db.add(participation)
+    db.commit()
+
+    process_race_result_submissions_batch(race_id=race.id, db=db)
+
+    ride = gpxo.Track(sample_ride_gpx)
+    ride_start_timestamp = ride.data.head(1).index.to_pydatetime()[0]
+    ride_end_timestamp = ride.data.tail(1).index.to_pydatetime()[0]
+
+    for participation in participations:
+        db.refresh(participation)
+        assert participation.ride_start_timestamp == ride_start_timestamp
+        assert participation.ride_end_timestamp < ride_end_timestamp
+        assert participation.place_generated_overall == 1
+
+    db.refresh(race)
+    assert race.status == RaceStatus.ended
+
+
+def test_process_submissions_batch_pending_only(
+        race_in_progress_with_rider_and_multiple_participations,
+        db, sample_ride_gpx):
+    race, participations, riders, bikes = race_in_progress_with_rider_and_multiple_participations
+    processed, submitted, *not_submitted = participations
+
+    processed.ride_gpx_file = sample_ride_gpx
+    processed.ride_start_timestamp = datetime(2024, 1, 10, 10, 0, 0)
+    processed.ride_end_timestamp = datetime(2024, 1, 10, 12, 0, 0)
+    submitted.ride_gpx_file = sample_ride_gpx
+    db.add_all([processed, submitted])
+    db.commit()
+
+    process_race_result_submissions_batch(race_id=race.id, db=db)
+
+    for participation in participations:
+        db.refresh(participation)
+    assert processed.ride_end_timestamp == datetime(2024, 1, 10, 12, 0, 0)
+    assert submitted.ride_end_timestamp is not None
+    assert all(participation.ride_end_timestamp is None for participation in not_submitted)
+
+    # riders without results are still racing
+    db.refresh(race)
+    assert race.status == RaceStatus.in_progress
+
+
+def test_claim_race_end_only_once(
+        race_in_progress_with_rider_and_multiple_participations, db):
+    race, participations, riders, bikes = race_in_progress_with_rider_and_multiple_participations
+
+    for participation in participations:
+        participation.ride_end_timestamp = datetime(2024, 1, 10, 12, 0, 0)
+        db.add(participation)
+    db.commit()
+
+    assert claim_race_end(race_id=race.id, db=db)
+    assert not claim_race_end(race_id=race.id, db=db)
+
+    db.refresh(race)
+    assert race.status == RaceStatus.ended
+
+
+def test_claim_race_end_unfinished_riders(
+        race_in_progress_with_rider_and_multiple_participations, db):
+    race, participations, riders, bikes = race_in_progress_with_rider_and_multiple_participations
+
+    for participation in participations[1:]:
+        participation.ride_end_timestamp = datetime(2024, 1, 10, 12, 0, 0)
+        db.add(participation)
+    db.commit()
+
+    assert not claim_race_end(race_id=race.id, db=db)
+
+    db.refresh(race)
+    assert race.status == RaceStatus.in_progress
+
+
+def test_process_submission_places_failure_keeps_race_in_progress(
+        race_in_progress_with_rider_and_participation,
+        db, sample_ride_gpx, monkeypatch):
+    race, participation, rider, bike = race_in_progress_with_rider_and_participation
+
+    def fail(race_id, db):
+        raise RuntimeError("places failed")
+
+    monkeypatch.setattr(process_race_result_submission_module, 'generate_places', fail)
+
+    with pytest.raises(RuntimeError):
+        process_race_result_submission(
+            race_id=race.id,
+            rider_id=rider.id,
+            recording_filepath=sample_ride_gpx,
+            db=db)
+    db.rollback()
+
+    db.refresh(race)
+    db.refresh(participation)
+    assert race.status == RaceStatus.in_progress
+    assert participation.ride_end_timestamp is not None
+
+    # a retry claims the race again and generates places
+    monkeypatch.undo()
+    process_race_result_submission(
+        race_id=race.id,
+        rider_id=rider.id,
+        recording_filepath=sample_ride_gpx,
+        db=db)
+
+    db.refresh(race)
+    db.refresh(participation)
+    assert race.status == RaceStatus.ended
+    assert participation.place_generated_overall == 1
@@ -1,9 +1,13 @@
 import json
-from typing import Sequence
+from typing import Optional, Sequence
 
+import pytest
 from sqlmodel import select, Session
 
-from app.tasks.recalculate_classification_scores import recalculate_classification_scores
+import app.tasks.recalculate_classification_scores as recalculate_classification_scores_module
+from app.tasks.recalculate_classification_scores import recalculate_classification_scores, \
+    apply_race_classification_scores, reconcile_classification_scores, ClassificationScoringEngine, \
+    schedule_classification_recalculation, run_pending_classification_recalculation
 from app.models.race import RaceStatus, RaceWind, RaceRain, RaceTemperature
 from app.models.race_participation import RaceParticipationStatus
 from app.models.bike import BikeType
@@ -13,6 +17,57 @@ from app.models.classification import Classification
 from app.models.rider_classification_link import RiderClassificationLink
 
 
+class _FakeRedisLock:
+    def __init__(self, redis, name):
+        self._redis = redis
+        self._name = name
+
+    def acquire(self, blocking=True):
+        return self._redis.set(self._name, 1, nx=True)
+
+    def release(self):
+        self._redis.delete(self._name)
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.values:
+            return None
+        self.values[name] = value
+        return True
+
+    def delete(self, *names):
+        for name in names:
+            self.values.pop(name, None)
+
+    def lock(self, name, timeout=None):
+        return _FakeRedisLock(self, name)
+
+
+@pytest.fixture(scope="function")
+def fake_redis(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(recalculate_classification_scores_module, 'redis_client', redis)
+    return redis
+
+
+@pytest.fixture(scope="function")
+def recalculation_scheduling(monkeypatch, fake_redis):
+    redis = fake_redis
+    scheduled = []
+    recalculated = []
+
+    monkeypatch.setattr(run_pending_classification_recalculation, 'apply_async',
+                        lambda kwargs, countdown: scheduled.append(kwargs["season_id"]))
+    monkeypatch.setattr(recalculate_classification_scores_module, 'recalculate_classification_scores',
+                        lambda season_id, db: recalculated.append(season_id))
+
+    return redis, scheduled, recalculated
+
+
 def _get_classification_entries(classification: Classification, season_1: Season, db: Session) -> Sequence[
     RiderClassificationLink
 ]:
@@ -26,9 +81,10 @@ def _get_classification_entries(classification: Classification, season_1: Season
     ).all()
 
 
+@pytest.mark.parametrize("engine", list(ClassificationScoringEngine))
 def test_recalculate_classification_scores_general(
         riders_with_bikes, race_factory, classifications,
-        race_participations_factory, race_classification_entries_factory, season_1, db
+        race_participations_factory, race_classification_entries_factory, season_1, db, engine
 ):
     riders, bikes = riders_with_bikes
     (r1, r2, r3, r4) = riders
@@ -83,7 +139,7 @@ def test_recalculate_classification_scores_general(
     db.commit()
 
     recalculate_classification_scores(
-        season_id=season_1.id, db=db
+        season_id=season_1.id, db=db, engine=engine
     )
 
     classification_scores = _get_classification_entries(classifications['general'], season_1, db)
@@ -96,9 +152,10 @@ def test_recalculate_classification_scores_general(
         assert cs.score == rider_id_to_points_mapping[cs.rider_id]
 
 
+@pytest.mark.parametrize("engine", list(ClassificationScoringEngine))
 def test_recalculate_classification_scores_bike_type(
         riders_with_bikes, race_factory, classifications,
-        race_participations_factory, race_classification_entries_factory, season_1, db
+        race_participations_factory, race_classification_entries_factory, season_1, db, engine
 ):
     riders, bikes = riders_with_bikes
     (r1, r2, r3, r4) = riders
@@ -141,7 +198,7 @@ def test_recalculate_classification_scores_bike_type(
     db.commit()
 
     recalculate_classification_scores(
-        season_id=season_1.id, db=db
+        season_id=season_1.id, db=db, engine=engine
     )
 
     road_classification_scores = _get_classification_entries(classifications['road'], season_1, db)
@@ -161,9 +218,58 @@ def test_recalculate_classification_scores_bike_type(
         assert cs.score == fixie_rider_id_to_points_mapping[cs.rider_id]
 
 
+def test_recalculate_classification_scores_skips_unknown_classification_places(
+        riders_with_bikes, race_factory, classifications, classification_without_rider,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+):
+    riders, bikes = riders_with_bikes
+
+    race1 = race_factory(
+        season=season_1,
+        status=RaceStatus.ended,
+        place_to_points_mapping_json=json.dumps([
+            {"place": 1, "points": 1000},
+            {"place": 2, "points": 100},
+        ])
+    )
+
+    race1_participations = race_participations_factory(
+        race=race1,
+        riders=riders,
+        bikes=bikes,
+        statuses=[RaceParticipationStatus.approved for _ in range(4)],
+        entry_kwargs=[{"place_assigned_overall": p} for p in [1, 2, 3, 4]]
+    )
+    # places in a classification that is not ranked, and so not known to the predicates scores are computed with
+    race1_classification_entries = race_classification_entries_factory(
+        classification=classifications['general'],
+        race_participations=race1_participations[:2],
+        places=[1, 2]
+    ) + race_classification_entries_factory(
+        classification=classification_without_rider,
+        race_participations=race1_participations[:2],
+        places=[1, 2]
+    )
+
+    db.add_all([race1, *race1_participations, *race1_classification_entries])
+    db.commit()
+
+    recalculate_classification_scores(
+        season_id=season_1.id, db=db, engine=ClassificationScoringEngine.python
+    )
+
+    general_classification_scores = _get_classification_entries(classifications['general'], season_1, db)
+    general_rider_id_to_points_mapping = {riders[0].id: 1000, riders[1].id: 100}
+    assert len(general_classification_scores) == 2
+    for cs in general_classification_scores:
+        assert cs.score == general_rider_id_to_points_mapping[cs.rider_id]
+    assert not _get_classification_entries(classification_without_rider, season_1, db)
+
+
+@pytest.mark.parametrize("engine", list(ClassificationScoringEngine))
 def test_recalculate_classification_scores_men_women(
         riders_with_bikes, race_factory, classifications,
-        race_participations_factory, race_classification_entries_factory, season_1, db
+        race_participations_factory, race_classification_entries_factory, season_1, db, engine
 ):
     riders, bikes = riders_with_bikes
     (r1, r2, r3, r4) = riders
@@ -208,7 +314,7 @@ def test_recalculate_classification_scores_men_women(
     db.commit()
 
     recalculate_classification_scores(
-        season_id=season_1.id, db=db
+        season_id=season_1.id, db=db, engine=engine
     )
 
     road_classification_scores = _get_classification_entries(classifications['men'], season_1, db)
@@ -228,9 +334,10 @@ def test_recalculate_classification_scores_men_women(
         assert cs.score == fixie_rider_id_to_points_mapping[cs.rider_id]
 
 
+@pytest.mark.parametrize("engine", list(ClassificationScoringEngine))
 def test_recalculate_classification_scores_weather_multipliers(
         riders_with_bikes, race_factory, classifications,
-        race_participations_factory, race_classification_entries_factory, season_1, db
+        race_participations_factory, race_classification_entries_factory, season_1, db, engine
 ):
     riders, bikes = riders_with_bikes
     (r1, r2, r3, r4) = riders
@@ -285,7 +392,7 @@ def test_recalculate_classification_scores_weather_multipliers(
     db.commit()
 
     recalculate_classification_scores(
-        season_id=season_1.id, db=db
+        season_id=season_1.id, db=db, engine=engine
     )
 
     classification_scores = _get_classification_entries(classifications['general'], season_1, db)
@@ -296,3 +403,231 @@ def test_recalculate_classification_scores_weather_multipliers(
     }
     for cs in classification_scores:
         assert cs.score == rider_id_to_points_mapping[cs.rider_id]
+
+
+def _create_two_races_with_general_and_men_places(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+):
+    riders, bikes = riders_with_bikes
+    (r1, r2, r3, r4) = riders
+
+    r1.account.gender = Gender.male
+    r3.account.gender = Gender.male
+    db.add_all([r1, r3])
+    db.commit()
+
+    races = []
+    for mapping, places in (([{"place": 1, "points": 100}, {"place": 4, "points": 10}], [1, 2, 3, 4]),
+                            ([{"place": 3, "points": 1000}, {"place": 999, "points": 500}], [4, 3, 2, 1])):
+        race = race_factory(
+            season=season_1,
+            status=RaceStatus.ended,
+            place_to_points_mapping_json=json.dumps(mapping),
+            wind=RaceWind.light
+        )
+        participations = race_participations_factory(
+            race=race,
+            riders=riders,
+            bikes=bikes,
+            statuses=[RaceParticipationStatus.approved for _ in range(4)],
+            entry_kwargs=[{"place_assigned_overall": p} for p in places]
+        )
+        race_classification_entries_factory(
+            classification=classifications['general'],
+            race_participations=participations,
+            places=places
+        )
+        race_classification_entries_factory(
+            classification=classifications['men'],
+            race_participations=[participations[0], participations[2]],
+            places=[1, 2]
+        )
+        races.append(race)
+
+    return races
+
+
+def _get_season_scores(season_1: Season, db: Session) -> dict[tuple[Optional[int], Optional[int]], int]:
+    return {
+        (link.classification_id, link.rider_id): link.score
+        for link in db.exec(
+            select(RiderClassificationLink)
+            .join(Classification,
+                  RiderClassificationLink.classification_id == Classification.id)  # type: ignore[arg-type]
+            .where(Classification.season_id == season_1.id)
+        ).all()
+    }
+
+
+def test_apply_race_classification_scores_matches_full_recompute(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db, fake_redis
+):
+    races = _create_two_races_with_general_and_men_places(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+    )
+
+    for race in races:
+        apply_race_classification_scores(race_id=race.id, db=db)
+    incremental_scores = _get_season_scores(season_1, db)
+
+    recalculate_classification_scores(season_id=season_1.id, db=db)
+    full_scores = _get_season_scores(season_1, db)
+
+    assert incremental_scores == full_scores
+    (r1, _, _, _), _ = riders_with_bikes
+    assert full_scores[(classifications['general'].id, r1.id)] == round(600 * 1.1)
+
+
+def test_reconcile_classification_scores_fixes_drift(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db, fake_redis
+):
+    races = _create_two_races_with_general_and_men_places(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+    )
+    for race in races:
+        apply_race_classification_scores(race_id=race.id, db=db)
+    expected_scores = _get_season_scores(season_1, db)
+
+    assert reconcile_classification_scores(season_id=season_1.id, db=db) == 0
+
+    link = db.exec(select(RiderClassificationLink)).first()
+    link.score += 5
+    db.add(link)
+    db.commit()
+
+    assert reconcile_classification_scores(season_id=season_1.id, db=db) == 1
+    assert _get_season_scores(season_1, db) == expected_scores
+
+
+def test_apply_race_classification_scores_only_once(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db, fake_redis
+):
+    first, second = _create_two_races_with_general_and_men_places(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+    )
+
+    assert apply_race_classification_scores(race_id=first.id, db=db)
+    scores = _get_season_scores(season_1, db)
+
+    # a retry or a second approval does not add points again
+    assert not apply_race_classification_scores(race_id=first.id, db=db)
+    assert _get_season_scores(season_1, db) == scores
+
+    # races included by a full recompute are skipped as well
+    recalculate_classification_scores(season_id=season_1.id, db=db)
+    full_scores = _get_season_scores(season_1, db)
+    assert not apply_race_classification_scores(race_id=second.id, db=db)
+    assert _get_season_scores(season_1, db) == full_scores
+
+
+def test_apply_race_classification_scores_rounds_season_total(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db, fake_redis
+):
+    (r1, _, _, _), (b1, _, _, _) = riders_with_bikes
+
+    races = []
+    for _ in range(2):
+        # 5 * 1.1 = 5.5 points per race - rounding each race separately would give 12 instead of 11
+        race = race_factory(
+            season=season_1,
+            status=RaceStatus.ended,
+            place_to_points_mapping_json=json.dumps([{"place": 999, "points": 5}]),
+            wind=RaceWind.light
+        )
+        participations = race_participations_factory(
+            race=race,
+            riders=[r1],
+            bikes=[b1],
+            statuses=[RaceParticipationStatus.approved],
+            entry_kwargs=[{"place_assigned_overall": 1}]
+        )
+        race_classification_entries_factory(
+            classification=classifications['general'],
+            race_participations=participations,
+            places=[1]
+        )
+        races.append(race)
+
+    for race in races:
+        apply_race_classification_scores(race_id=race.id, db=db)
+
+    assert _get_season_scores(season_1, db)[(classifications['general'].id, r1.id)] == 11
+
+
+def test_apply_race_classification_scores_postponed_when_locked(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db, fake_redis, monkeypatch
+):
+    race, _ = _create_two_races_with_general_and_men_places(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+    )
+    postponed = []
+    monkeypatch.setattr(apply_race_classification_scores, 'apply_async',
+                        lambda kwargs, countdown: postponed.append(kwargs["race_id"]))
+
+    fake_redis.lock(f"classification_recalculation:{season_1.id}:lock").acquire()
+    assert not apply_race_classification_scores(race_id=race.id, db=db)
+    assert not reconcile_classification_scores(season_id=season_1.id, db=db)
+
+    assert postponed == [race.id]
+    assert _get_season_scores(season_1, db) == {}
+
+
+def test_recalculate_classification_scores_engines_equal(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+):
+    _create_two_races_with_general_and_men_places(
+        riders_with_bikes, race_factory, classifications,
+        race_participations_factory, race_classification_entries_factory, season_1, db
+    )
+
+    recalculate_classification_scores(season_id=season_1.id, db=db, engine=ClassificationScoringEngine.python)
+    python_scores = _get_season_scores(season_1, db)
+
+    recalculate_classification_scores(season_id=season_1.id, db=db, engine=ClassificationScoringEngine.sql)
+    sql_scores = _get_season_scores(season_1, db)
+
+    assert sql_scores == python_scores
+
+
+def test_schedule_classification_recalculation_coalesces(recalculation_scheduling):
+    _, scheduled, recalculated = recalculation_scheduling
+
+    assert schedule_classification_recalculation(season_id=1)
+    assert not schedule_classification_recalculation(season_id=1)
+    assert not schedule_classification_recalculation(season_id=1)
+    assert schedule_classification_recalculation(season_id=2)
+    assert scheduled == [1, 2]
+
+    assert run_pending_classification_recalculation(season_id=1)
+    assert recalculated == [1]
+
+    # requests after the run started schedule another one
+    assert schedule_classification_recalculation(season_id=1)
+    assert scheduled == [1, 2, 1]
+
+
+def test_run_pending_classification_recalculation_postponed_when_running(recalculation_scheduling):
+    redis, scheduled, recalculated = recalculation_scheduling
+
+    assert schedule_classification_recalculation(season_id=1)
+    redis.lock("classification_recalculation:1:lock").acquire()
+
+    assert not run_pending_classification_recalculation(season_id=1)
+    assert recalculated == []
+    assert scheduled == [1, 1]
+    assert not schedule_classification_recalculation(season_id=1)
+
+    redis.lock("classification_recalculation:1:lock").release()
+    assert run_pending_classification_recalculation(season_id=1)
+    assert recalculated == [1]
@@ -0,0 +1,86 @@
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from app.models.account import Gender
+from app.models.bike import BikeType
+from app.models.classification import Classification, ClassificationPredicate
+from app.util.classification_registry import ClassificationRegistry, classification_registry
+
+
+def test_classification_registry(classifications, season_1, db, assert_statement_count):
+    registry = ClassificationRegistry()
+    season_id = season_1.id
+    expected = {
+        classification.id: ClassificationPredicate.from_json(classification.predicate_json)
+        for classification in classifications.values()
+    }
+
+    # a miss reads the version and the classifications, a hit only the version
+    with assert_statement_count(2):
+        assert registry.get(season_id, db) == expected
+    with assert_statement_count(1):
+        assert registry.get(season_id, db) == expected
+    assert registry.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": registry.maxsize}
+
+    assert expected[classifications["road"].id] == ClassificationPredicate(bike_type=BikeType.road)
+    assert expected[classifications["women"].id] == ClassificationPredicate(gender=Gender.female)
+
+
+def test_classification_registry_reloads_changed_classifications(classifications, season_1, db):
+    registry = ClassificationRegistry()
+    registry.get(season_1.id, db)
+
+    # changed in another process, e.g. by the API while a worker has the season cached
+    classifications["road"].predicate_json = ClassificationPredicate(bike_type=BikeType.fixie).to_json()
+    db.add(classifications["road"])
+    db.commit()
+    road_id = classifications["road"].id
+    assert registry.get(season_1.id, db)[road_id] == ClassificationPredicate(bike_type=BikeType.fixie)
+
+    added = Classification(
+        name="Ostre koło kobiet",
+        description="Rowery typu fixie, klasyfikacja kobiet.",
+        predicate_json=ClassificationPredicate(bike_type=BikeType.fixie, gender=Gender.female).to_json(),
+        season=season_1,
+    )
+    db.add(added)
+    db.commit()
+    assert added.id in registry.get(season_1.id, db)
+
+    db.delete(added)
+    db.commit()
+    assert added.id not in registry.get(season_1.id, db)
+    assert registry.stats()["hits"] == 0
+
+
+def test_classification_registry_skips_classifications_without_predicate(
+        classifications, classification_without_rider, season_1, db):
+    registry = ClassificationRegistry()
+
+    assert classification_without_rider.id not in registry.get(season_1.id, db)
+    assert len(registry.get(season_1.id, db)) == len(classifications)
+
+
+def test_classification_registry_new_season(coordinator_client, classifications, season_1, db):
+    classification_registry.get(season_1.id, db)
+
+    response = coordinator_client.post("/api/coordinator/season/start-new", json={"name": "Test Season"})
+    assert response.status_code == 201
+
+    assert set(classification_registry.get(response.json()['id'], db).values()) == \
+        {ClassificationPredicate.from_json(c.predicate_json) for c in classifications.values()}
+
+
+def test_classification_predicate_json():
+    predicate = ClassificationPredicate(bike_type=BikeType.fixie, gender=Gender.male)
+
+    assert ClassificationPredicate.from_json(predicate.to_json()) == predicate
+    assert ClassificationPredicate.from_json('{}') == ClassificationPredicate()
+    assert ClassificationPredicate(gender=Gender.male).admits_gender(Gender.male)
+    assert not ClassificationPredicate(gender=Gender.male).admits_gender(None)
+    assert ClassificationPredicate(bike_type=BikeType.road).admits_gender(Gender.female)
+
+    with pytest.raises(ValidationError):
+        ClassificationPredicate.from_json('{"bike_type": "tandem"}')
+    with pytest.raises(ValidationError):
+        ClassificationPredicate.from_json('{"age": 18}')
@@ -0,0 +1,240 @@
+import time
+import shutil
+import threading
+
+import anyio
+import gpxo
+import numpy as np
+import pytest
+
+import app.util.gpx.reader as reader
+import app.util.gpx.offload as offload
+from app.core.metrics import gpx_job_queue_wait
+from app.util.gpx.reader import read_gpx_track, iter_trackpoints
+from app.util.gpx.route_artifact import artifact_path, compile_route, load_route, publish_route, write_route_artifact
+from app.util.gpx.route_cache import RouteCache
+from app.util.gpx.trackpoints import is_loop, route_endpoints
+from app.benchmark.import_time import measure
+
+EMPTY_GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="https://gpx.studio">
+<metadata>
+    <name>new</name>
+    <time>2024-01-08T20:00:00.000Z</time>
+</metadata>
+<trk>
+    <name>new</name>
+    <trkseg>
+    </trkseg>
+</trk>
+</gpx>
+"""
+
+
+@pytest.mark.parametrize("asset_path", ['app/test/assets/test_recording.gpx', 'app/test/assets/track.gpx'])
+def test_read_gpx_track_matches_gpxo(asset_path):
+    track = read_gpx_track(asset_path)
+    reference = gpxo.Track(asset_path)
+
+    assert track.latitude.dtype == np.float64
+    assert np.array_equal(track.latitude, reference.latitude)
+    assert np.array_equal(track.longitude, reference.longitude)
+    if reference.time is None:
+        assert not track.has_time
+        assert np.isnat(track.time).all()
+    else:
+        assert track.has_time
+        assert np.array_equal(
+            track.time,
+            np.array([t.replace(tzinfo=None) for t in reference.time], dtype='datetime64[ns]')
+        )
+
+
+def test_read_gpx_track_grows_arrays(sample_ride_gpx, monkeypatch):
+    monkeypatch.setattr(reader, 'MIN_TRKPT_BYTES', 10 ** 9)
+    monkeypatch.setattr(reader, 'INITIAL_CAPACITY', 7)
+
+    track = read_gpx_track(sample_ride_gpx)
+
+    assert len(track.latitude) == len(track.longitude) == len(track.time) == 499
+    assert np.array_equal(track.latitude, np.array([lat for lat, _, _ in iter_trackpoints(sample_ride_gpx)]))
+
+
+def test_read_gpx_track_empty_segment(tmp_path):
+    path = tmp_path / 'empty.gpx'
+    path.write_text(EMPTY_GPX)
+
+    track = read_gpx_track(str(path))
+
+    assert len(track.latitude) == 0
+    assert not track.has_time
+
+
+def test_route_cache_hits_and_misses(sample_track_gpx):
+    cache = RouteCache(maxsize=4)
+
+    first = cache.get(sample_track_gpx)
+    second = cache.get(sample_track_gpx)
+
+    assert first is second
+    assert not first.latitude.flags.writeable
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 4}
+
+
+def test_route_cache_invalidated_on_file_change(sample_track_gpx):
+    cache = RouteCache(maxsize=4)
+    first = cache.get(sample_track_gpx)
+
+    with open(sample_track_gpx, mode='w') as fp:
+        fp.write(EMPTY_GPX)
+
+    second = cache.get(sample_track_gpx)
+
+    assert first is not second
+    assert len(second.latitude) == 0
+    assert cache.stats()["misses"] == 2
+
+
+def test_route_cache_evicts_least_recently_used(sample_track_gpx, sample_ride_gpx):
+    cache = RouteCache(maxsize=1)
+
+    cache.get(sample_track_gpx)
+    cache.get(sample_ride_gpx)
+    cache.get(sample_track_gpx)
+
+    assert cache.stats() == {"hits": 0, "misses": 3, "size": 1, "maxsize": 1}
+
+
+def test_route_artifact_round_trip(tmp_path):
+    gpx_path = str(tmp_path / 'track.gpx')
+    shutil.copy2('app/test/assets/track.gpx', gpx_path)
+    track = read_gpx_track(gpx_path)
+
+    path = write_route_artifact(track, gpx_path)
+    route = load_route(gpx_path)
+
+    assert path == artifact_path(gpx_path) == str(tmp_path / 'track.npy')
+    assert isinstance(route.points, np.memmap)
+    assert np.array_equal(route.points, compile_route(track).points)
+    assert np.array_equal(route.start_point, track.start_point)
+    assert np.array_equal(route.end_point, track.end_point)
+    assert route.bounding_box == (track.latitude.min(), track.longitude.min(),
+                                  track.latitude.max(), track.longitude.max())
+    assert np.all(np.diff(route.distance) >= 0)
+    assert 0 < route.total_distance < 10_000
+
+
+def test_route_artifact_falls_back_to_gpx(tmp_path):
+    gpx_path = str(tmp_path / 'track.gpx')
+    shutil.copy2('app/test/assets/track.gpx', gpx_path)
+
+    route = load_route(gpx_path)
+
+    assert not isinstance(route.points, np.memmap)
+    assert not route.points.flags.writeable
+    assert np.array_equal(route.end_point, read_gpx_track(gpx_path).end_point)
+
+
+def test_route_artifact_stale_sidecar(tmp_path):
+    gpx_path = str(tmp_path / 'track.gpx')
+    shutil.copy2('app/test/assets/track.gpx', gpx_path)
+    write_route_artifact(read_gpx_track(gpx_path), gpx_path)
+
+    # route replaced after its sidecar was written
+    shutil.copyfile('app/test/assets/test_recording.gpx', gpx_path)
+    route = load_route(gpx_path)
+
+    assert not isinstance(route.points, np.memmap)
+    assert np.array_equal(route.end_point, read_gpx_track(gpx_path).end_point)
+
+
+def test_publish_route(tmp_path):
+    upload_path = str(tmp_path / 'upload')
+    gpx_path = str(tmp_path / 'track.gpx')
+    shutil.copy2('app/test/assets/track.gpx', upload_path)
+
+    publish_route(upload_path, gpx_path)
+    route = load_route(gpx_path)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['track.gpx', 'track.npy']
+    assert isinstance(route.points, np.memmap)
+    assert np.array_equal(route.end_point, read_gpx_track(gpx_path).end_point)
+
+
+def test_publish_route_failure_leaves_no_files(tmp_path, monkeypatch):
+    upload_path = str(tmp_path / 'upload')
+    shutil.copy2('app/test/assets/track.gpx', upload_path)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, 'save', fail)
+
+    with pytest.raises(OSError):
+        publish_route(upload_path, str(tmp_path / 'track.gpx'))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("asset_path", ['app/test/assets/test_recording.gpx', 'app/test/assets/track.gpx'])
+def test_is_loop_matches_numpy_track(asset_path):
+    track = read_gpx_track(asset_path)
+    start, end = route_endpoints(asset_path)
+
+    assert np.array_equal(np.array(start), track.start_point)
+    assert np.array_equal(np.array(end), track.end_point)
+    distance = np.linalg.norm(track.start_point - track.end_point)
+    assert is_loop(asset_path, threshold=distance * 1.01)
+    assert not is_loop(asset_path, threshold=distance * 0.99)
+
+
+def test_route_endpoints_empty_segment(tmp_path):
+    path = tmp_path / 'empty.gpx'
+    path.write_text(EMPTY_GPX)
+
+    with pytest.raises(ValueError):
+        route_endpoints(str(path))
+
+
+def test_api_does_not_import_scientific_stack():
+    loaded = measure('app.main')['loaded']
+
+    assert not {'pandas', 'scipy', 'gpxo', 'matplotlib'} & set(loaded)
+
+
+def test_run_gpx_job_limits_concurrency(monkeypatch):
+    monkeypatch.setattr(offload, '_gpx_limiter', None)
+    monkeypatch.setattr(offload, 'GPX_WORKER_THREADS', 2)
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def parse(i):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return i
+
+    async def upload_burst():
+        results = []
+
+        async def upload(i):
+            results.append(await offload.run_gpx_job('test_burst', parse, i))
+
+        async with anyio.create_task_group() as tg:
+            for i in range(6):
+                tg.start_soon(upload, i)
+        return results
+
+    assert sorted(anyio.run(upload_burst)) == list(range(6))
+    assert peak == 2
+
+    samples = {suffix: value for (suffix, labels), value in gpx_job_queue_wait.samples()
+               if ('job', 'test_burst') in labels and suffix in ('_count', '_sum')}
+    assert samples['_count'] == 6
+    # jobs over the limit waited for at least one other job to finish
+    assert samples['_sum'] >= 0.05 * 4
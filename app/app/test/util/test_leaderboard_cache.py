@@ -0,0 +1,172 @@
+import json
+
+import pytest
+from redis.exceptions import ConnectionError, WatchError
+
+from app.util import leaderboard_cache as leaderboard_cache_module
+from app.util.leaderboard_cache import get_standings, get_standings_around, rebuild_leaderboard_cache
+
+
+def _member(value):
+    return str(value).encode()
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+        self._watched = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def watch(self, name):
+        self._watched = (name, self._redis.version)
+
+    def exists(self, name):
+        return self._redis.exists(name)
+
+    def multi(self):
+        pass
+
+    def __getattr__(self, command):
+        return lambda *args, **kwargs: self._commands.append((command, args, kwargs))
+
+    def execute(self):
+        if self._watched is not None and self._watched[1] != self._redis.version:
+            raise WatchError()
+        for command, args, kwargs in self._commands:
+            getattr(self._redis, command)(*args, **kwargs)
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.version = 0
+
+    def exists(self, name):
+        return int(name in self.values)
+
+    def delete(self, *names):
+        self.version += 1
+        for name in names:
+            self.values.pop(name, None)
+
+    def zadd(self, name, mapping):
+        self.version += 1
+        self.values.setdefault(name, {}).update({_member(k): v for k, v in mapping.items()})
+
+    def hset(self, name, mapping):
+        self.version += 1
+        self.values.setdefault(name, {}).update({_member(k): v for k, v in mapping.items()})
+
+    def expire(self, name, time):
+        pass
+
+    def _ordered(self, name):
+        return sorted(self.values.get(name, {}), key=lambda member: self.values[name][member])
+
+    def zrange(self, name, start, end):
+        members = self._ordered(name)
+        return members[start:] if end == -1 else members[start:end + 1]
+
+    def zrank(self, name, value):
+        members = self._ordered(name)
+        return members.index(_member(value)) if _member(value) in members else None
+
+    def hmget(self, name, keys):
+        return [self.values.get(name, {}).get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def standings(self, classification_id):
+        key = f"leaderboard:{classification_id}"
+        return [json.loads(entry) for entry in self.hmget(f"{key}:entries", self._ordered(key))]
+
+
+class _UnavailableRedis:
+    def zrange(self, name, start, end):
+        raise ConnectionError()
+
+    def zrank(self, name, value):
+        raise ConnectionError()
+
+    def pipeline(self, transaction=True):
+        raise ConnectionError()
+
+
+@pytest.fixture(scope="function")
+def fake_redis(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(leaderboard_cache_module, 'redis_client', redis)
+    return redis
+
+
+def test_rebuild_leaderboard_cache(db, fake_redis, season_1, classification_with_rider, classification_without_rider,
+                                   rider1):
+    rebuild_leaderboard_cache(season_id=season_1.id, db=db)
+
+    assert fake_redis.standings(classification_with_rider.id) == [{
+        "rider_id": rider1.id,
+        "score": 10,
+        "name": rider1.account.name,
+        "surname": rider1.account.surname,
+        "username": rider1.account.username,
+        "rank": 1
+    }]
+    assert not fake_redis.exists(f"leaderboard:{classification_without_rider.id}")
+
+
+def test_get_standings_serves_cached_page(db, fake_redis, classification_with_rider):
+    key = f"leaderboard:{classification_with_rider.id}"
+    fake_redis.zadd(key, {rider_id: position for position, rider_id in enumerate([7, 5, 9])})
+    fake_redis.hset(f"{key}:entries", mapping={rider_id: json.dumps({"rider_id": rider_id}) for rider_id in [5, 7, 9]})
+
+    assert get_standings(classification_with_rider.id, db) == [{"rider_id": 7}, {"rider_id": 5}, {"rider_id": 9}]
+    assert get_standings(classification_with_rider.id, db, offset=1, limit=1) == [{"rider_id": 5}]
+    assert get_standings(classification_with_rider.id, db, offset=3, limit=2) == []
+    assert get_standings_around(classification_with_rider.id, 9, 1, db) == [{"rider_id": 5}, {"rider_id": 9}]
+    assert get_standings_around(classification_with_rider.id, 1, 1, db) == []
+
+
+def test_get_standings_miss_populates_cache(db, fake_redis, classification_with_rider, rider1):
+    standings = get_standings(classification_with_rider.id, db, offset=0, limit=10)
+
+    assert [entry["rider_id"] for entry in standings] == [rider1.id]
+    assert fake_redis.standings(classification_with_rider.id) == standings
+    assert get_standings_around(classification_with_rider.id, rider1.id, 5, db) == standings
+
+
+def test_get_standings_empty_not_cached(db, fake_redis, classification_without_rider):
+    assert get_standings(classification_without_rider.id, db) == []
+    assert get_standings(3438948973, db) == []
+
+    assert fake_redis.values == {}
+
+
+def test_get_standings_miss_does_not_overwrite_rebuild(db, fake_redis, classification_with_rider, monkeypatch):
+    read_standings = leaderboard_cache_module.read_standings
+
+    def read_and_rebuild(classification_ids, db):
+        standings = read_standings(classification_ids, db)
+        # a rebuild finishing while the miss is being read
+        fake_redis.zadd(f"leaderboard:{classification_with_rider.id}", {1: 0})
+        fake_redis.hset(f"leaderboard:{classification_with_rider.id}:entries", mapping={1: json.dumps({"rider_id": 1})})
+        return standings
+
+    monkeypatch.setattr(leaderboard_cache_module, 'read_standings', read_and_rebuild)
+    get_standings(classification_with_rider.id, db)
+
+    assert fake_redis.standings(classification_with_rider.id) == [{"rider_id": 1}]
+
+
+def test_leaderboard_cache_unavailable(db, monkeypatch, season_1, classification_with_rider, rider1):
+    monkeypatch.setattr(leaderboard_cache_module, 'redis_client', _UnavailableRedis())
+
+    rebuild_leaderboard_cache(season_id=season_1.id, db=db)
+    assert get_standings(classification_with_rider.id, db) is None
+    assert get_standings_around(classification_with_rider.id, rider1.id, 1, db) is None
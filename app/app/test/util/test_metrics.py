@@ -0,0 +1,50 @@
+import pytest
+
+from app.util.metrics import MetricsRegistry, Counter, Gauge, Histogram
+
+
+def test_render_counter_and_gauge():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("jobs", "Jobs done.", labelnames=("queue",)))
+    gauge = registry.register(Gauge("pool_size", "Pool size.", labelnames=("pool",),
+                                    callback=lambda: [({"pool": "default"}, 5)]))
+
+    counter.inc(queue="a")
+    counter.inc(2, queue="a")
+    counter.inc(queue='b"c')
+
+    assert registry.render() == (
+        '# HELP jobs Jobs done.\n'
+        '# TYPE jobs counter\n'
+        'jobs_total{queue="a"} 3\n'
+        'jobs_total{queue="b\\"c"} 1\n'
+        '# HELP pool_size Pool size.\n'
+        '# TYPE pool_size gauge\n'
+        'pool_size{pool="default"} 5\n'
+    )
+    assert gauge.samples() == [(("", (("pool", "default"),)), 5)]
+
+
+def test_render_histogram():
+    registry = MetricsRegistry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1)))
+
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value)
+
+    assert registry.render() == (
+        '# HELP latency_seconds Latency.\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 3\n'
+        'latency_seconds_bucket{le="+Inf"} 4\n'
+        'latency_seconds_count 4\n'
+        'latency_seconds_sum 4.05\n'
+    )
+
+
+def test_metric_labels_required():
+    counter = Counter("jobs", "Jobs done.", labelnames=("queue",))
+
+    with pytest.raises(ValueError):
+        counter.inc()
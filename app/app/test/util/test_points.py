@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from app.util.points import PointsTable, PointsTableCache
+
+MAPPING = [
+    {"place": 1, "points": 100},
+    {"place": 3, "points": 50},
+    {"place": 10, "points": 5},
+]
+
+
+@pytest.mark.parametrize("place, expected_points", [(1, 100), (2, 50), (3, 50), (4, 5), (10, 5), (11, 0)])
+def test_points_table(place, expected_points):
+    assert PointsTable(MAPPING).points_for_place(place) == expected_points
+
+
+def test_points_table_unsorted_mapping():
+    table = PointsTable(list(reversed(MAPPING)))
+
+    assert [table.points_for_place(place) for place in range(1, 12)] == \
+           [PointsTable(MAPPING).points_for_place(place) for place in range(1, 12)]
+
+
+def test_points_table_empty_mapping():
+    assert PointsTable([]).points_for_place(1) == 0
+
+
+def test_points_table_cache():
+    cache = PointsTableCache(maxsize=2)
+    mapping_json = json.dumps(MAPPING)
+
+    table = cache.get(mapping_json)
+    assert cache.get(mapping_json) is table
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+    # a changed mapping is a different entry, without any invalidation
+    changed_json = json.dumps([{"place": 1, "points": 1}])
+    assert cache.get(changed_json).points_for_place(1) == 1
+    assert cache.get(mapping_json) is table
+    assert cache.stats() == {"hits": 2, "misses": 2, "size": 2, "maxsize": 2}
+
+    cache.get(json.dumps([]))
+    assert cache.stats()["size"] == 2
+    assert cache.get(changed_json) is not table
+    assert cache.stats()["misses"] == 4
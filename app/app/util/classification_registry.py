@@ -0,0 +1,56 @@
+import os
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.models.classification import Classification, ClassificationPredicate
+from app.util.lru_cache import VersionedLRUCache
+
+CLASSIFICATION_REGISTRY_SIZE = int(os.environ.get("FASTAPI_CLASSIFICATION_REGISTRY_SIZE", default="16"))
+
+
+class ClassificationRegistry(VersionedLRUCache[int, dict[int, ClassificationPredicate]]):
+    """
+    Process-local LRU cache of ranked classifications (the ones with a predicate) of a season, by id. Entries are
+    validated against the count, highest id and last update of the season's classifications, read with one aggregate
+    query, so a classification added, removed or changed in another process is resolved again here. A hit still costs
+    that query, but saves loading and validating the predicates, and no process has to be told about changes.
+    """
+
+    def __init__(self, maxsize: int = CLASSIFICATION_REGISTRY_SIZE):
+        super().__init__(maxsize=maxsize)
+
+    def get(self, season_id: int, db: Session) -> dict[int, ClassificationPredicate]:
+        ranked = (
+            Classification.season_id == season_id,
+            Classification.predicate_json != None  # noqa: E711
+        )
+
+        version = tuple(db.exec(
+            select(  # type: ignore[call-overload]
+                func.count(Classification.id),
+                func.max(Classification.id),
+                func.max(Classification.updated_timestamp)
+            )
+            .where(*ranked)
+        ).one())
+
+        def load() -> dict[int, ClassificationPredicate]:
+            rows = db.exec(
+                select(Classification.id, Classification.predicate_json)  # type: ignore[call-overload]
+                .where(*ranked)
+                .order_by(Classification.id)  # type: ignore[arg-type]
+            ).all()
+            return {
+                id: ClassificationPredicate.from_json(predicate_json)  # type: ignore[misc, arg-type]
+                for id, predicate_json in rows
+            }
+
+        return self.get_or_load(season_id, version, load)
+
+
+classification_registry = ClassificationRegistry()
+
+
+def get_season_classifications(season_id: int, db: Session) -> dict[int, ClassificationPredicate]:
+    return classification_registry.get(season_id, db)
@@ -0,0 +1,145 @@
+from datetime import datetime
+from enum import Enum
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6_371_000.
+
+# distance to the end point (in degrees, as in the dataframe engine) below which a local minimum counts as a finish
+FINISH_DISTANCE_THRESHOLD = 0.00015
+
+SMOOTHING_WINDOW = 15
+
+MINIMA_ORDER = 5
+
+
+class FinishDetectionEngine(Enum):
+    numpy = "numpy"
+    dataframe = "dataframe"
+
+
+def haversine(
+        latitude1: np.ndarray,
+        longitude1: np.ndarray,
+        latitude2: np.ndarray,
+        longitude2: np.ndarray
+) -> np.ndarray:
+    """
+    Element-wise great-circle distance (in meters) between two sets of points given in degrees.
+    """
+    lat1, lon1 = np.radians(latitude1), np.radians(longitude1)
+    lat2, lon2 = np.radians(latitude2), np.radians(longitude2)
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+def smooth(x: np.ndarray, n: int = SMOOTHING_WINDOW) -> np.ndarray:
+    """
+    Hanning window smoothing, identical to `gpxo.general.smooth` (ends of the signal are padded with reflected
+    copies so the output has the same length as the input).
+    """
+    if x.size < n:
+        raise ValueError("Input vector needs to be larger than window size.")
+
+    if n == 1:
+        return x
+
+    x_expanded = np.concatenate((2 * x[0] - x[n:0:-1], x, 2 * x[-1] - x[-2:-n - 2:-1]))
+    w = np.hanning(n)
+    y = np.convolve(w / w.sum(), x_expanded, mode='valid')
+
+    istart = int(n / 2) + 1
+    return y[istart:istart + len(x)]
+
+
+def degree_distance(
+        latitude: np.ndarray,
+        longitude: np.ndarray,
+        point: np.ndarray
+) -> np.ndarray:
+    """
+    Euclidean distance (in degrees) between each (latitude, longitude) pair and a single point. It is what the
+    dataframe engine measures, so minima and the threshold select the same trackpoints in both engines.
+    """
+    return np.hypot(latitude - point[0], longitude - point[1])
+
+
+def detect_finish_timestamp(
+        latitude: np.ndarray,
+        longitude: np.ndarray,
+        time: np.ndarray,
+        end_point: np.ndarray,
+        no_laps: int
+) -> datetime:
+    """
+    Array-based equivalent of the dataframe finish detection. Distances to the end point are computed over whole
+    columns, only the trackpoints around the selected minimum are used for interpolation.
+
+    Minima, the threshold and the interpolation use the same degree-space geometry as `interpolate_end_timestamp`.
+    The only deviation is a projection of the end point falling before the first interpolation point: the dataframe
+    engine takes the unsigned distance and mirrors it into the segment, here it is rejected like one past the second
+    point, so the caller falls back instead of storing a timestamp from the wrong side of the finish line.
+
+    `time` has to be a `datetime64` array of naive timestamps aligned with `latitude` and `longitude`.
+    """
+    if end_point.shape != (2,):
+        raise ValueError(f'GPX processing error: end point coordinates have wrong shape ({end_point.shape})')
+
+    if not latitude.shape == longitude.shape == time.shape:
+        raise ValueError('GPX processing error: latitude, longitude and time arrays have different shapes')
+
+    latitude = smooth(np.asarray(latitude, dtype=np.float64))
+    longitude = smooth(np.asarray(longitude, dtype=np.float64))
+
+    dist = degree_distance(latitude, longitude, end_point)
+
+    # imported on use, scipy is only needed by Celery workers and takes long to import in the API
+    from scipy.signal import argrelmin
+
+    # find points locally closest to track end
+    indices = argrelmin(dist, order=MINIMA_ORDER)[0]
+
+    if len(indices) < 2:
+        raise ValueError(f'GPX processing error: found less than 2 distance minima ({len(indices)})')
+
+    # filter out local minima not located near track's end
+    filtered = indices[dist[indices] < FINISH_DISTANCE_THRESHOLD]
+
+    if no_laps > len(filtered):
+        raise ValueError("GPX contains fewer laps than specified")
+
+    if len(filtered) == 0:
+        raise ValueError("No trackpoint in GPX is near race end point")
+
+    # get trackpoint closest to end in final lap; use `min` in case recording in app starts with a delay
+    closest = filtered[min(len(filtered), no_laps + 1) - 1]
+
+    # sample neighbouring points to closest, discard one with the greatest dist
+    neighbourhood = np.arange(max(closest - 1, 0), min(closest + 2, len(dist)))
+    first, second = np.sort(neighbourhood[np.argsort(dist[neighbourhood], kind='stable')[:2]])
+
+    # points relative to track end, in degrees like the dataframe engine
+    p_first = np.array([latitude[first], longitude[first]]) - end_point
+    p_second = np.array([latitude[second], longitude[second]]) - end_point
+
+    # analytically find point between p_first and p_second closest to track end (origin)
+    segment = p_second - p_first
+    segment_length_sq = segment @ segment
+    if segment_length_sq == 0:
+        fraction = 0.
+    else:
+        fraction = float(-(p_first @ segment) / segment_length_sq)
+
+    if not 0. <= fraction <= 1.:
+        raise ValueError(
+            f'GPX processing error: interpolated timestamp not between interpolation points '
+            f'({time[first]}, {time[second]})')
+
+    t_first = time[first].astype('datetime64[ns]')
+    delta_t = time[second].astype('datetime64[ns]') - t_first
+    t_interpolated = t_first + (delta_t * fraction).astype('timedelta64[ns]')
+
+    return t_interpolated.astype('datetime64[us]').item()
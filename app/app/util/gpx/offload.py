@@ -0,0 +1,40 @@
+import os
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+import anyio
+
+from app.core.metrics import gpx_job_queue_wait, gpx_job_duration
+
+# GPX parsing is CPU-bound and holds the GIL, more threads would only slow down the event loop
+GPX_WORKER_THREADS = int(os.environ.get("FASTAPI_GPX_WORKER_THREADS", default="2"))
+
+_T = TypeVar("_T")
+
+_gpx_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def get_gpx_limiter() -> anyio.CapacityLimiter:
+    # created lazily, a limiter is bound to the event loop it is first used in
+    global _gpx_limiter
+    if _gpx_limiter is None:
+        _gpx_limiter = anyio.CapacityLimiter(GPX_WORKER_THREADS)
+    return _gpx_limiter
+
+
+async def run_gpx_job(name: str, fn: Callable[..., _T], *args: Any) -> _T:
+    """
+    Call `fn(*args)` in a worker thread, at most `GPX_WORKER_THREADS` at once, so parsing and moving uploaded files
+    doesn't block the event loop. Jobs over the limit wait for a free thread, the wait is recorded as `name`.
+    """
+    queued_at = time.perf_counter()
+
+    def job() -> _T:
+        started_at = time.perf_counter()
+        gpx_job_queue_wait.observe(started_at - queued_at, job=name)
+        try:
+            return fn(*args)
+        finally:
+            gpx_job_duration.observe(time.perf_counter() - started_at, job=name)
+
+    return await anyio.to_thread.run_sync(job, limiter=get_gpx_limiter())
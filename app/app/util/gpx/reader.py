@@ -0,0 +1,59 @@
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from app.util.gpx.trackpoints import iter_trackpoints
+
+# smallest realistic trackpoint (`<trkpt lat="52.2" lon="21.0"></trkpt>` plus indentation) - used to estimate
+# array capacity from file size
+MIN_TRKPT_BYTES = 48
+
+INITIAL_CAPACITY = 1024
+
+
+class GpxTrack(NamedTuple):
+    path: str
+    latitude: np.ndarray
+    longitude: np.ndarray
+    time: np.ndarray
+
+    @property
+    def has_time(self) -> bool:
+        return len(self.time) > 0 and not np.isnat(self.time).any()
+
+    @property
+    def start_point(self) -> np.ndarray:
+        return np.array([self.latitude[0], self.longitude[0]])
+
+    @property
+    def end_point(self) -> np.ndarray:
+        return np.array([self.latitude[-1], self.longitude[-1]])
+
+
+def read_gpx_track(path: str) -> GpxTrack:
+    """
+    Read trackpoints from a GPX file into float64 / datetime64 arrays. Missing timestamps are stored as NaT.
+    """
+    capacity = max(os.path.getsize(path) // MIN_TRKPT_BYTES, INITIAL_CAPACITY)
+    latitude = np.empty(capacity, dtype=np.float64)
+    longitude = np.empty(capacity, dtype=np.float64)
+    time = np.empty(capacity, dtype='datetime64[ns]')
+
+    size = 0
+    for lat, lon, t in iter_trackpoints(path):
+        if size == capacity:
+            capacity *= 2
+            latitude.resize(capacity, refcheck=False)
+            longitude.resize(capacity, refcheck=False)
+            time.resize(capacity, refcheck=False)
+
+        latitude[size] = lat
+        longitude[size] = lon
+        time[size] = np.datetime64('NaT') if t is None else np.datetime64(t, 'ns')
+        size += 1
+
+    for array in (latitude, longitude, time):
+        array.resize(size, refcheck=False)
+
+    return GpxTrack(path=path, latitude=latitude, longitude=longitude, time=time)
@@ -0,0 +1,149 @@
+import os
+import shutil
+from contextlib import suppress
+from typing import Optional
+
+import numpy as np
+
+from app.util.gpx.finish_detection import haversine
+from app.util.gpx.reader import GpxTrack, read_gpx_track
+from app.util.log import get_logger
+
+logger = get_logger()
+
+ARTIFACT_EXTENSION = '.npy'
+
+# first row of a sidecar, read as int64: (ARTIFACT_MAGIC, mtime_ns, size) of the GPX file it was compiled from
+ARTIFACT_MAGIC = 0x52545631
+
+
+class RouteArtifact:
+    """
+    Compiled race route. Backed by a (N, 3) float64 array of latitude, longitude and cumulative distance (in meters)
+    which is memory-mapped when loaded from a sidecar file, so loading it does not copy the data.
+    """
+
+    def __init__(self, points: np.ndarray):
+        if points.ndim != 2 or points.shape[1] != 3:
+            raise ValueError(f'Route artifact has wrong shape ({points.shape})')
+        self.points = points
+
+    @property
+    def latitude(self) -> np.ndarray:
+        return self.points[:, 0]
+
+    @property
+    def longitude(self) -> np.ndarray:
+        return self.points[:, 1]
+
+    @property
+    def distance(self) -> np.ndarray:
+        return self.points[:, 2]
+
+    @property
+    def start_point(self) -> np.ndarray:
+        return np.array(self.points[0, :2])
+
+    @property
+    def end_point(self) -> np.ndarray:
+        return np.array(self.points[-1, :2])
+
+    @property
+    def total_distance(self) -> float:
+        return float(self.points[-1, 2]) if len(self.points) else 0.
+
+    @property
+    def bounding_box(self) -> tuple[float, float, float, float]:
+        """
+        (min latitude, min longitude, max latitude, max longitude)
+        """
+        lower = self.points[:, :2].min(axis=0)
+        upper = self.points[:, :2].max(axis=0)
+        return float(lower[0]), float(lower[1]), float(upper[0]), float(upper[1])
+
+
+def artifact_path(gpx_path: str) -> str:
+    return os.path.splitext(gpx_path)[0] + ARTIFACT_EXTENSION
+
+
+def compile_route(track: GpxTrack) -> RouteArtifact:
+    points = np.empty((len(track.latitude), 3), dtype=np.float64)
+    points[:, 0] = track.latitude
+    points[:, 1] = track.longitude
+    if len(points):
+        points[0, 2] = 0.
+        np.cumsum(haversine(track.latitude[:-1], track.longitude[:-1], track.latitude[1:], track.longitude[1:]),
+                  out=points[1:, 2])
+
+    return RouteArtifact(points)
+
+
+def source_header(gpx_path: str) -> np.ndarray:
+    stat = os.stat(gpx_path)
+    return np.array([ARTIFACT_MAGIC, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def write_route_artifact(track: GpxTrack, gpx_path: str, source_path: Optional[str] = None) -> str:
+    """
+    Compile the route and store it next to the GPX file, along with the mtime and size of `source_path` (the GPX file
+    itself by default). The file is written under a temporary name and then renamed, so readers never see a partially
+    written artifact.
+    """
+    path = artifact_path(gpx_path)
+    tmp_path = f'{path}.tmp'
+
+    points = compile_route(track).points
+    data = np.empty((len(points) + 1, 3), dtype=np.float64)
+    data[0].view(np.int64)[:] = source_header(source_path or gpx_path)
+    data[1:] = points
+
+    try:
+        with open(tmp_path, 'wb') as fp:
+            np.save(fp, data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+    return path
+
+
+def publish_route(upload_path: str, gpx_path: str) -> str:
+    """
+    Move an uploaded GPX file to `gpx_path` and write its sidecar. The GPX file is staged next to its destination and
+    renamed only once the sidecar is in place, so a published route always comes with a matching sidecar and a failed
+    upload leaves neither behind.
+    """
+    staged_path = f'{gpx_path}.tmp'
+    shutil.move(upload_path, staged_path)
+
+    try:
+        # renaming keeps mtime and size, so the sidecar matches the published file
+        write_route_artifact(read_gpx_track(staged_path), gpx_path, source_path=staged_path)
+        os.replace(staged_path, gpx_path)
+    except BaseException:
+        for path in (staged_path, artifact_path(gpx_path)):
+            with suppress(FileNotFoundError):
+                os.remove(path)
+        raise
+
+    return gpx_path
+
+
+def load_route(gpx_path: str) -> RouteArtifact:
+    """
+    Memory-map the compiled route if its sidecar exists and was compiled from the current GPX file, fall back to
+    parsing the GPX file otherwise.
+    """
+    path = artifact_path(gpx_path)
+
+    if os.path.exists(path):
+        data = np.load(path, mmap_mode='r')
+        if data.ndim == 2 and len(data) and np.array_equal(data[0].view(np.int64), source_header(gpx_path)):
+            return RouteArtifact(data[1:])
+        logger.warning(f"Route sidecar {path} does not match {gpx_path}, parsing GPX file")
+
+    route = compile_route(read_gpx_track(gpx_path))
+    route.points.flags.writeable = False
+    return route
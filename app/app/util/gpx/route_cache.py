@@ -0,0 +1,27 @@
+import os
+
+from app.util.gpx.route_artifact import RouteArtifact, load_route
+from app.util.lru_cache import VersionedLRUCache
+
+ROUTE_CACHE_SIZE = int(os.environ.get("FASTAPI_ROUTE_CACHE_SIZE", default="32"))
+
+
+class RouteCache(VersionedLRUCache[str, RouteArtifact]):
+    """
+    Process-local LRU cache of compiled race routes. Entries are keyed by GPX path and validated against file mtime and
+    size, so a route replaced on disk is loaded again. Cached arrays are read-only, as they are shared between tasks.
+    """
+
+    def __init__(self, maxsize: int = ROUTE_CACHE_SIZE):
+        super().__init__(maxsize=maxsize)
+
+    def get(self, path: str) -> RouteArtifact:
+        stat = os.stat(path)
+        return self.get_or_load(path, (stat.st_mtime_ns, stat.st_size), lambda: load_route(path))
+
+
+route_cache = RouteCache()
+
+
+def read_route(path: str) -> RouteArtifact:
+    return route_cache.get(path)
@@ -0,0 +1,80 @@
+import math
+from datetime import datetime
+from typing import Iterator, Optional
+from xml.etree.ElementTree import Element, iterparse
+
+# standard library only - used by the API to validate uploaded files without importing numpy
+
+GPX_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<gpx'
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_time(text: Optional[str]) -> Optional[datetime]:
+    if not text:
+        return None
+    text = text.strip()
+    if text.endswith('Z'):
+        text = text[:-1]
+    # keep wall time and drop timezone, same as gpxo does
+    return datetime.fromisoformat(text).replace(tzinfo=None)
+
+
+def has_gpx_header(path: str) -> bool:
+    with open(path, 'r') as f:
+        return f.read(len(GPX_HEADER)) == GPX_HEADER
+
+
+def iter_trackpoints(path: str) -> Iterator[tuple[float, float, Optional[datetime]]]:
+    """
+    Stream (latitude, longitude, time) of trackpoints in the first segment of the first track. Elements are discarded
+    as soon as they are parsed, so memory usage does not depend on file size.
+    """
+    seen = {'trk': 0, 'trkseg': 0}
+    segment: Optional[Element] = None
+    time: Optional[datetime] = None
+
+    for event, elem in iterparse(path, events=('start', 'end')):
+        name = _local_name(elem.tag)
+
+        if event == 'start':
+            if name == 'trkseg' and seen['trk'] == 1 and seen['trkseg'] == 0:
+                segment = elem
+            if name in seen:
+                seen[name] += 1
+            continue
+
+        if name == 'trkseg' and segment is elem:
+            return
+        elif name == 'time' and segment is not None:
+            time = _parse_time(elem.text)
+        elif name == 'trkpt' and segment is not None:
+            yield float(elem.attrib['lat']), float(elem.attrib['lon']), time
+            time = None
+            segment.clear()
+
+
+def route_endpoints(path: str) -> tuple[tuple[float, float], tuple[float, float]]:
+    """
+    (latitude, longitude) of the first and the last trackpoint.
+    """
+    start: Optional[tuple[float, float]] = None
+    end: Optional[tuple[float, float]] = None
+    for lat, lon, _ in iter_trackpoints(path):
+        if start is None:
+            start = (lat, lon)
+        end = (lat, lon)
+
+    if start is None or end is None:
+        raise ValueError('GPX contains no trackpoints')
+    return start, end
+
+
+def is_loop(path: str, threshold: float) -> bool:
+    """
+    Whether the track ends within `threshold` (in degrees) of its start.
+    """
+    start, end = route_endpoints(path)
+    return math.dist(start, end) <= threshold
@@ -0,0 +1,178 @@
+import os
+import json
+from typing import Any, Optional
+
+from redis.client import Pipeline
+from redis.exceptions import RedisError, WatchError
+from sqlmodel import Session, select
+
+from app.core.redis import redis_client
+from app.db.leaderboard import classification_standings
+from app.models.classification import Classification
+from app.util.log import get_logger
+
+logger = get_logger()
+
+# upper bound of staleness in case a rebuild could not reach Redis
+LEADERBOARD_CACHE_TTL_SECONDS = int(os.environ.get("FASTAPI_LEADERBOARD_CACHE_TTL_SECONDS", default="86400"))
+
+STANDINGS_FIELDS = ("rider_id", "score", "name", "surname", "username", "rank")
+
+
+def read_standings(classification_ids: list[int], db: Session) -> dict[int, list[dict[str, Any]]]:
+    """
+    Ordered standings of given classifications from the database. Classifications without entries map to empty lists.
+    """
+    standings = classification_standings(classification_ids)
+    rows = db.exec(
+        select(*standings.c)  # type: ignore[call-overload]
+        .order_by(standings.c.classification_id, standings.c.position)
+    ).all()
+
+    result: dict[int, list[dict[str, Any]]] = {classification_id: [] for classification_id in classification_ids}
+    for row in rows:
+        result[row.classification_id].append({field: getattr(row, field) for field in STANDINGS_FIELDS})
+    return result
+
+
+def get_standings(
+        classification_id: int,
+        db: Session,
+        offset: int = 0,
+        limit: Optional[int] = None
+) -> Optional[list[dict[str, Any]]]:
+    """
+    A page of ordered standings of a classification (all of them if `limit` is None), from the cache or, on a miss,
+    from the database (caching them). Returns None if Redis is unavailable, so callers can fall back to paginated
+    database queries.
+    """
+    stop = -1 if limit is None else offset + limit - 1
+    if limit is not None and limit <= 0:
+        return []
+
+    key = _leaderboard_key(classification_id)
+    try:
+        rider_ids = redis_client.zrange(key, offset, stop)
+        entries = _read_entries(classification_id, rider_ids)  # type: ignore[arg-type]
+        if entries is not None and (entries or redis_client.exists(key)):
+            return entries
+    except RedisError as e:
+        logger.warning(f"Leaderboard cache unavailable: {e}")
+        return None
+
+    standings = _cache_missing_standings(classification_id, db)
+    return standings[offset:] if limit is None else standings[offset:offset + limit]
+
+
+def get_standings_around(
+        classification_id: int,
+        rider_id: int,
+        around: int,
+        db: Session
+) -> Optional[list[dict[str, Any]]]:
+    """
+    Entry of a rider in cached standings of a classification, with up to `around` entries above and below it. Empty if
+    the rider has no entry, None if Redis is unavailable.
+    """
+    key = _leaderboard_key(classification_id)
+    try:
+        position: Optional[int] = redis_client.zrank(key, rider_id)  # type: ignore[assignment]
+        if position is not None:
+            rider_ids = redis_client.zrange(key, max(position - around, 0), position + around)
+            entries = _read_entries(classification_id, rider_ids)  # type: ignore[arg-type]
+            if entries is not None:
+                return entries
+        elif redis_client.exists(key):
+            return []
+    except RedisError as e:
+        logger.warning(f"Leaderboard cache unavailable: {e}")
+        return None
+
+    standings = _cache_missing_standings(classification_id, db)
+    position = next((i for i, entry in enumerate(standings) if entry["rider_id"] == rider_id), None)
+    if position is None:
+        return []
+    return standings[max(position - around, 0):position + around + 1]
+
+
+def _read_entries(classification_id: int, rider_ids: list[bytes]) -> Optional[list[dict[str, Any]]]:
+    """
+    Cached entries of given riders, in order. None if any of them is missing, e.g. the standings expired meanwhile.
+    """
+    if not rider_ids:
+        return []
+    entries = redis_client.hmget(_entries_key(classification_id), rider_ids)
+    if any(entry is None for entry in entries):  # type: ignore[union-attr]
+        return None
+    return [json.loads(entry) for entry in entries]  # type: ignore[union-attr]
+
+
+def _cache_missing_standings(classification_id: int, db: Session) -> list[dict[str, Any]]:
+    """
+    Read standings of a classification from the database and cache them, unless they are empty - the classification
+    may not exist or have no scores yet, which must not be pinned until the TTL passes.
+    """
+    standings = read_standings([classification_id], db)[classification_id]
+    if not standings:
+        return standings
+
+    key = _leaderboard_key(classification_id)
+    try:
+        with redis_client.pipeline(transaction=True) as pipe:
+            # never overwrite a rebuild which finished in the meantime
+            pipe.watch(key)
+            if pipe.exists(key):
+                return standings
+            pipe.multi()
+            _store_standings(pipe, classification_id, standings)
+            pipe.execute()
+    except WatchError:
+        pass
+    except RedisError as e:
+        logger.warning(f"Could not cache leaderboard of classification {classification_id}: {e}")
+    return standings
+
+
+def _store_standings(pipe: Pipeline, classification_id: int, standings: list[dict[str, Any]]) -> None:
+    """
+    Queue replacing cached standings of a classification. Rider ids are kept in a sorted set scored by position, so a
+    page is a ZRANGE, and entries in a hash by rider id. Empty standings only delete the old ones.
+    """
+    key, entries_key = _leaderboard_key(classification_id), _entries_key(classification_id)
+    pipe.delete(key, entries_key)
+    if not standings:
+        return
+    pipe.zadd(key, {entry["rider_id"]: position for position, entry in enumerate(standings)})
+    pipe.hset(entries_key, mapping={entry["rider_id"]: json.dumps(entry) for entry in standings})
+    pipe.expire(key, LEADERBOARD_CACHE_TTL_SECONDS)
+    pipe.expire(entries_key, LEADERBOARD_CACHE_TTL_SECONDS)
+
+
+def rebuild_leaderboard_cache(season_id: int, db: Session) -> None:
+    """
+    Replace cached standings of all classifications in a season with current scores, in a single transaction, so
+    readers never see a mix of old and new standings. Must be called after new scores are committed.
+    """
+    classification_ids = list(db.exec(
+        select(Classification.id).where(Classification.season_id == season_id)
+    ).all())
+    standings = read_standings(classification_ids, db)  # type: ignore[arg-type]
+
+    try:
+        with redis_client.pipeline(transaction=True) as pipe:
+            for classification_id, entries in standings.items():
+                _store_standings(pipe, classification_id, entries)
+            pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not rebuild leaderboard cache of season {season_id}: {e}")
+        return
+
+    logger.info(f"Rebuilt leaderboard cache of {len(standings)} classifications in season {season_id}")
+
+
+def _leaderboard_key(classification_id: int) -> str:
+    return f"leaderboard:{classification_id}"
+
+
+def _entries_key(classification_id: int) -> str:
+    return f"leaderboard:{classification_id}:entries"
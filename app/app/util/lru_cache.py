@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class VersionedLRUCache(Generic[K, V]):
+    """
+    Process-local, thread-safe LRU cache. Every entry is stored along with the version of the data it was built from
+    (e.g. file mtime and size, or a row version) and served only while the caller passes the same version, so entries
+    are refreshed by the process reading them - invalidating from another process (the API for Celery workers) is
+    never needed. Values are shared between threads and must not be modified.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, tuple[Hashable, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: K, version: Hashable, load: Callable[[], V]) -> V:
+        """
+        Cached value of `key` if it was built from `version`, otherwise the result of `load()`, which is cached. `load`
+        runs without the lock held, so concurrent misses of the same key may load it more than once.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = load()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, Optional[int]]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
@@ -0,0 +1,225 @@
+import json
+import math
+import threading
+from typing import Callable, Iterable, Optional, Protocol, TypeVar
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.util.log import get_logger
+
+logger = get_logger()
+
+# metrics are rendered in Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+
+# (sample name suffix, label pairs)
+_SampleKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class MetricStore(Protocol):
+    def inc(self, key: _SampleKey, value: float) -> None: ...
+
+    def set(self, key: _SampleKey, value: float) -> None: ...
+
+    def items(self) -> Iterable[tuple[_SampleKey, float]]: ...
+
+
+class LocalStore:
+    """
+    Samples kept in memory of the current process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[_SampleKey, float] = {}
+
+    def inc(self, key: _SampleKey, value: float) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.) + value
+
+    def set(self, key: _SampleKey, value: float) -> None:
+        with self._lock:
+            self._values[key] = value
+
+    def items(self) -> Iterable[tuple[_SampleKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class RedisStore:
+    """
+    Samples kept in a Redis hash, so metrics of all Celery worker processes can be rendered by the API. Metrics are
+    not worth failing for, Redis errors are only logged.
+    """
+
+    def __init__(self, redis: Redis, key: str):
+        self._redis = redis
+        self._key = key
+
+    def inc(self, key: _SampleKey, value: float) -> None:
+        try:
+            self._redis.hincrbyfloat(self._key, json.dumps(key), value)
+        except RedisError as e:
+            logger.warning(f"Could not update metric {key}: {e}")
+
+    def set(self, key: _SampleKey, value: float) -> None:
+        try:
+            self._redis.hset(self._key, json.dumps(key), str(value))
+        except RedisError as e:
+            logger.warning(f"Could not update metric {key}: {e}")
+
+    def items(self) -> Iterable[tuple[_SampleKey, float]]:
+        try:
+            values = self._redis.hgetall(self._key)
+        except RedisError as e:
+            logger.warning(f"Could not read metrics from {self._key}: {e}")
+            return []
+
+        items = []
+        for field, value in values.items():  # type: ignore[union-attr]
+            suffix, labels = json.loads(field)
+            items.append(((suffix, tuple((name, label_value) for name, label_value in labels)), float(value)))
+        return items
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 store: Optional[MetricStore] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.store: MetricStore = store if store is not None else LocalStore()
+
+    def _labels(self, labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} requires labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self) -> Iterable[tuple[_SampleKey, float]]:
+        return self.store.items()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, value: float = 1., **labels: str) -> None:
+        self.store.inc(("_total", self._labels(labels)), value)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 store: Optional[MetricStore] = None,
+                 callback: Optional[Callable[[], Iterable[tuple[dict[str, str], float]]]] = None):
+        """
+        If `callback` is given, it is called on each render to get `(labels, value)` pairs, instead of using the
+        store.
+        """
+        super().__init__(name, documentation, labelnames, store)
+        self.callback = callback
+
+    def inc(self, value: float = 1., **labels: str) -> None:
+        self.store.inc(("", self._labels(labels)), value)
+
+    def dec(self, value: float = 1., **labels: str) -> None:
+        self.store.inc(("", self._labels(labels)), -value)
+
+    def set(self, value: float, **labels: str) -> None:
+        self.store.set(("", self._labels(labels)), value)
+
+    def samples(self) -> Iterable[tuple[_SampleKey, float]]:
+        if self.callback is None:
+            return super().samples()
+        return [(("", self._labels(labels)), value) for labels, value in self.callback()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 store: Optional[MetricStore] = None, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, store)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        label_pairs = self._labels(labels)
+        # buckets are stored non-cumulative, so an observation is a single increment
+        bucket = next(b for b in self.buckets if value <= b)
+        self.store.inc(("_bucket", label_pairs + (("le", _format_value(bucket)),)), 1)
+        self.store.inc(("_sum", label_pairs), value)
+        self.store.inc(("_count", label_pairs), 1)
+
+    def samples(self) -> Iterable[tuple[_SampleKey, float]]:
+        samples = []
+        buckets: dict[tuple[tuple[str, str], ...], dict[str, float]] = {}
+        for (suffix, labels), value in super().samples():
+            if suffix == "_bucket":
+                buckets.setdefault(labels[:-1], {})[labels[-1][1]] = value
+            else:
+                samples.append(((suffix, labels), value))
+
+        for labels, counts in buckets.items():
+            cumulative = 0.
+            for bucket in self.buckets:
+                le = _format_value(bucket)
+                cumulative += counts.get(le, 0.)
+                samples.append((("_bucket", labels + (("le", le),)), cumulative))
+        return samples
+
+
+_M = TypeVar("_M", bound=Metric)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: _M) -> _M:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation, help_text=True)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for (suffix, labels), value in sorted(metric.samples(), key=_sort_key):
+                label_text = ",".join(f'{name}="{_escape(label_value)}"' for name, label_value in labels)
+                lines.append(f"{metric.name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text else
+                             f"{metric.name}{suffix} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def _sort_key(sample: tuple[_SampleKey, float]) -> tuple:
+    (suffix, labels), _ = sample
+    # keep buckets of a histogram in increasing order
+    return tuple(name_value for name_value in labels if name_value[0] != "le"), suffix, \
+        next((float(v) for k, v in labels if k == "le"), 0.)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str, help_text: bool = False) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value if help_text else value.replace('"', '\\"')
@@ -0,0 +1,51 @@
+import os
+import json
+import bisect
+import hashlib
+from typing import Any
+
+from app.util.lru_cache import VersionedLRUCache
+
+POINTS_TABLE_CACHE_SIZE = int(os.environ.get("FASTAPI_POINTS_TABLE_CACHE_SIZE", default="256"))
+
+
+class PointsTable:
+    """
+    Race place to points mapping compiled into arrays sorted by place. A place gets points of the first mapping entry
+    with `place` not lower than it, or 0 if it is past the last one. Entries don't have to be sorted in the JSON.
+    """
+
+    def __init__(self, mapping: list[dict[str, Any]]):
+        # stable sort, so the first of entries with the same place wins
+        entries = sorted(((item['place'], item['points']) for item in mapping), key=lambda entry: entry[0])
+        self.places = [place for place, _ in entries]
+        self.points = [points for _, points in entries]
+
+    @classmethod
+    def from_json(cls, mapping_json: str) -> "PointsTable":
+        return cls(json.loads(mapping_json))
+
+    def points_for_place(self, place: int) -> float:
+        i = bisect.bisect_left(self.places, place)
+        return self.points[i] if i < len(self.places) else 0
+
+
+class PointsTableCache(VersionedLRUCache[str, PointsTable]):
+    """
+    Process-local LRU cache of compiled points tables keyed by a hash of the mapping JSON. A changed mapping is a new
+    key, so no process ever has to be told about the change, and races sharing a mapping share a table.
+    """
+
+    def __init__(self, maxsize: int = POINTS_TABLE_CACHE_SIZE):
+        super().__init__(maxsize=maxsize)
+
+    def get(self, mapping_json: str) -> PointsTable:
+        key = hashlib.sha256(mapping_json.encode()).hexdigest()
+        return self.get_or_load(key, None, lambda: PointsTable.from_json(mapping_json))
+
+
+points_table_cache = PointsTableCache()
+
+
+def get_points_table(mapping_json: str) -> PointsTable:
+    return points_table_cache.get(mapping_json)
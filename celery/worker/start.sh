@@ -3,4 +3,7 @@
 set -o errexit
 set -o nounset
 
+# sizes the DB connection pool for running a single task per process
+export FASTAPI_PROCESS_TYPE=worker
+
 celery -A app.core.celery worker --loglevel=info
\ No newline at end of file